@@ -1,7 +1,92 @@
-bind = "127.0.0.1:5000"
-workers = 3
+import os
+import shutil
+import tempfile
+
+
+def cpu_count():
+    # Учитываем ограничение CPU для процесса (taskset, контейнер)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+cpus = cpu_count()
+
+# Режим сервера: wsgi (синхронные воркеры) или asgi (uvicorn-воркеры под gunicorn)
+mode = os.environ.get("GUNICORN_MODE", "wsgi")
+if mode == "asgi":
+    wsgi_app = "web_2025.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = int(os.environ.get("GUNICORN_WORKERS", cpus + 1))
+else:
+    wsgi_app = "web_2025.wsgi:application"
+    # Потоки перекрывают ожидание БД и кэша внутри одного процесса
+    threads = int(os.environ.get("GUNICORN_THREADS", 2))
+    if threads > 1:
+        worker_class = "gthread"
+    workers = int(os.environ.get("GUNICORN_WORKERS", cpus * 2 + 1))
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:5000")
 timeout = 120
 
-accesslog = "/var/log/gunicorn/access.log"
-errorlog = "/var/log/gunicorn/error.log"
-loglevel = "info"
\ No newline at end of file
+# Приложение импортируется один раз в мастере, воркеры получают его через fork
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Перезапуск воркеров против роста памяти; разброс, чтобы не перезапускались одновременно
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "/var/log/gunicorn/access.log")
+errorlog = os.environ.get("GUNICORN_ERROR_LOG", "/var/log/gunicorn/error.log")
+loglevel = "info"
+
+# Метрики /metrics: каждый воркер пишет значения в свои файлы в этом каталоге.
+# Переменная должна быть задана до импорта prometheus_client (в мастере при preload_app)
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "fefu_lab_metrics")
+)
+
+
+def on_starting(server):
+    # Файлы прошлого запуска дали бы лишние счетчики
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def warm_up_worker(log, worker):
+    if os.environ.get("GUNICORN_WARMUP", "1") != "1":
+        return
+    from fefu_lab.warmup import warm_up
+    # Соединение прогретого потока пригодится только sync-воркеру: он обслуживает
+    # запросы в том же главном потоке
+    timings = warm_up(keep_connection=mode == "wsgi" and threads == 1)
+    log.info(
+        "Worker %s warmed up: %s", worker.pid,
+        ", ".join(f"{step}={ms:.1f}ms" for step, ms in timings.items()),
+    )
+
+
+def post_fork(server, worker):
+    # Прогрев воркера до первого запроса: URL-резолвер, шаблоны, соединение с БД
+    if preload_app:
+        warm_up_worker(server.log, worker)
+
+
+def post_worker_init(worker):
+    # Без preload_app приложение загружается уже в воркере, после post_fork
+    if not preload_app:
+        warm_up_worker(worker.log, worker)
+
+
+def worker_exit(server, worker):
+    # Отзывы из очереди отложенной записи, накопленные дельты дашборда и наблюдения,
+    # которые фоновые потоки еще не записали в БД и файлы метрик
+    from fefu_lab import dashboard, feedback_buffer, metrics
+    feedback_buffer.shutdown()
+    dashboard.flush_deltas()
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Сравнение синхронного (WSGI) и асинхронного (ASGI, uvicorn-воркеры) режимов gunicorn
+# при одинаковом числе воркеров.
+#
+# Запуск из каталога с manage.py (БД и окружение как для обычного запуска):
+#   python ../deploy/scripts/bench_server_modes.py --workers 3 --concurrency 32 \
+#       --path / --path /course/python-basics/ --path /student/1/
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gunicorn', 'config.py')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер не ответил за {timeout} с: {url}')
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return (time.perf_counter() - started) * 1000, status
+
+
+def run_mode(mode, args):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_MODE=mode, GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_WORKERS=str(args.workers), GUNICORN_ACCESS_LOG='-', GUNICORN_ERROR_LOG='-')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', CONFIG],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f'http://127.0.0.1:{port}'
+        wait_ready(base + args.paths[0])
+        urls = [base + path for path in args.paths]
+        # Прогрев: первые запросы каждого воркера не учитываем
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(fetch, urls * args.workers * 2))
+        jobs = [urls[i % len(urls)] for i in range(args.requests)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(fetch, jobs))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    timings = sorted(timing for timing, _ in results)
+    errors = sum(1 for _, status in results if status >= 500)
+    return {
+        'rps': len(results) / elapsed,
+        'p50': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение WSGI и ASGI режимов gunicorn')
+    parser.add_argument('--workers', type=int, default=3, help='Число воркеров в обоих режимах')
+    parser.add_argument('--concurrency', type=int, default=32, help='Одновременных запросов')
+    parser.add_argument('--requests', type=int, default=2000, help='Всего запросов на режим')
+    parser.add_argument('--path', action='append', dest='paths', help='Путь для замера (можно повторять)')
+    parser.add_argument('--mode', action='append', dest='modes', choices=['wsgi', 'asgi'],
+                        help='Режимы для сравнения (по умолчанию оба)')
+    args = parser.parse_args()
+    args.paths = args.paths or ['/']
+    for mode in args.modes or ['wsgi', 'asgi']:
+        result = run_mode(mode, args)
+        print(f'{mode}: {result["rps"]:.1f} запросов/с, p50={result["p50"]:.1f} мс, '
+              f'p95={result["p95"]:.1f} мс, ошибок 5xx: {result["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Время до первого байта (TTFB) у только что запущенного воркера gunicorn:
+# с прогревом в post_fork (GUNICORN_WARMUP=1) и без него.
+#
+# Запуск из каталога с manage.py (БД и окружение как для обычного запуска):
+#   python ../deploy/scripts/bench_startup.py --runs 5 --path / --path /course/python-basics/
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gunicorn', 'config.py')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f'Порт {port} не открылся за {timeout} с')
+
+
+def ttfb(port, path):
+    #Миллисекунды от отправки запроса до получения заголовков ответа
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        started = time.perf_counter()
+        connection.request('GET', path)
+        response = connection.getresponse()
+        elapsed = (time.perf_counter() - started) * 1000
+        response.read()
+        return elapsed
+    finally:
+        connection.close()
+
+
+def run_once(warmup, args):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_WARMUP='1' if warmup else '0', GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_WORKERS='1', GUNICORN_ACCESS_LOG='-', GUNICORN_ERROR_LOG='-')
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', CONFIG],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_port(port)
+        # Запрос сразу после открытия порта ждет загрузки воркера
+        launch = ttfb(port, args.paths[0]) + (time.perf_counter() - started) * 1000
+        # Остальные пути — первые запросы к уже загруженному воркеру
+        time.sleep(args.settle)
+        first = {path: ttfb(port, path) for path in args.paths[1:]}
+        repeat = {path: ttfb(port, path) for path in args.paths}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return launch, first, repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TTFB свежезапущенного воркера gunicorn')
+    parser.add_argument('--runs', type=int, default=5, help='Запусков сервера на вариант')
+    parser.add_argument('--settle', type=float, default=1.0, help='Пауза после первого ответа, с')
+    parser.add_argument('--path', action='append', dest='paths', help='Путь для замера (можно повторять)')
+    args = parser.parse_args()
+    args.paths = args.paths or ['/', '/about/']
+    for warmup in (False, True):
+        launches, firsts, repeats = [], {}, {}
+        for _ in range(args.runs):
+            launch, first, repeat = run_once(warmup, args)
+            launches.append(launch)
+            for path, value in first.items():
+                firsts.setdefault(path, []).append(value)
+            for path, value in repeat.items():
+                repeats.setdefault(path, []).append(value)
+        print(f'Прогрев {"включен" if warmup else "выключен"}:')
+        print(f'  запуск -> первый байт {args.paths[0]}: {statistics.median(launches):.1f} мс')
+        for path, values in firsts.items():
+            print(f'  первый запрос {path}: {statistics.median(values):.1f} мс')
+        for path, values in repeats.items():
+            print(f'  повторный запрос {path}: {statistics.median(values):.1f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -70,6 +70,12 @@ DB_USER='${DB_USER}'
 DB_PASSWORD='${DB_PASSWORD}'
 DB_HOST='localhost'
 DB_PORT='5432'
+
+DJANGO_CACHE_BACKEND='file'
+DJANGO_CACHE_LOCATION='/var/tmp/fefu_lab_cache'
+
+DB_CONN_STRATEGY='persistent'
+DB_CONN_MAX_AGE='60'
 EOF
 
 chmod 600 "${ENV_FILE}"
@@ -95,9 +101,12 @@ fi
 
 echo "[9/9] Install configs: gunicorn systemd + nginx, then start"
 cp "${APP_DIR}/deploy/systemd/gunicorn.service" /etc/systemd/system/gunicorn.service
+cp "${APP_DIR}/deploy/systemd/fefu-clearsessions.service" /etc/systemd/system/fefu-clearsessions.service
+cp "${APP_DIR}/deploy/systemd/fefu-clearsessions.timer" /etc/systemd/system/fefu-clearsessions.timer
 systemctl daemon-reload
 systemctl enable gunicorn
 systemctl restart gunicorn
+systemctl enable --now fefu-clearsessions.timer
 
 cp "${APP_DIR}/deploy/nginx/fefu_lab.conf" /etc/nginx/sites-available/fefu_lab.conf
 ln -sf /etc/nginx/sites-available/fefu_lab.conf /etc/nginx/sites-enabled/fefu_lab.conf
@@ -27,6 +27,9 @@ PY
 echo "[entrypoint] migrate..."
 python manage.py migrate --noinput
 
+echo "[entrypoint] clearsessions..."
+python manage.py clearsessions || true
+
 if [ "${RUN_SEED:-0}" = "1" ]; then
   echo "[entrypoint] seed_data..."
   python manage.py seed_data || true
@@ -37,5 +40,10 @@ if [ -d "/app/staticfiles" ] && [ -z "$(ls -A /app/static 2>/dev/null)" ]; then
   cp -r /app/staticfiles/* /app/static/ || true
 fi
 
+if [ -n "${PROMETHEUS_MULTIPROC_DIR:-}" ]; then
+  rm -rf "${PROMETHEUS_MULTIPROC_DIR}"
+  mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+fi
+
 echo "[entrypoint] start: $@"
 exec "$@"
\ No newline at end of file
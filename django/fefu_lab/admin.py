@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Student, Instructor, Course, Enrollment, Feedback, UserProfile
+from .models import Student, Instructor, Course, Enrollment, Feedback, UserProfile, DashboardSnapshot, WaitlistEntry
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -13,7 +13,7 @@ class StudentAdmin(admin.ModelAdmin):
             'fields': ('first_name', 'last_name', 'email', 'birth_date')
         }),
         ('Университет', {
-            'fields': ('faculty', 'is_active')
+            'fields': ('faculty', 'role', 'instructor', 'is_active')
         }),
     )
 
@@ -26,7 +26,7 @@ class InstructorAdmin(admin.ModelAdmin):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'instructor', 'duration', 'level', 'price', 'is_active']
+    list_display = ['title', 'instructor', 'duration', 'level', 'price', 'active_enrollments', 'is_active']
     list_filter = ['is_active', 'level', 'instructor']
     search_fields = ['title', 'description']
     list_editable = ['is_active', 'price']
@@ -44,6 +44,11 @@ class CourseAdmin(admin.ModelAdmin):
             'fields': ('is_active',)
         }),
     )
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо ILIKE '%...%' по всему описанию
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term), False
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
@@ -52,6 +57,19 @@ class EnrollmentAdmin(admin.ModelAdmin):
     search_fields = ['student__first_name', 'student__last_name', 'course__title']
     date_hierarchy = 'enrollment_date'
 
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'course', 'created_at']
+    list_filter = ['course']
+    search_fields = ['student__first_name', 'student__last_name', 'course__title']
+    list_select_related = ['student', 'course']
+
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'refreshed_at', 'total_students', 'total_teachers',
+                    'total_courses', 'total_enrollments', 'active_enrollments']
+    readonly_fields = list_display
+
 # Тут регистрируем существующие модели
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
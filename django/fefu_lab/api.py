@@ -0,0 +1,160 @@
+import base64
+import binascii
+import json
+from functools import wraps
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from .models import Student, Course, Enrollment
+
+# JSON API только для чтения. Страницы листаются курсором (keyset): вместо OFFSET
+# следующая страница начинается строго после последней строки предыдущей по
+# ordering модели + id, поэтому глубокие страницы стоят столько же, сколько первая.
+# Строки берутся через values() и сериализуются без создания экземпляров моделей.
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+COURSE_FIELDS = ('id', 'slug', 'title', 'level', 'duration', 'price', 'max_students',
+                 'active_enrollments', 'instructor_id')
+STUDENT_FIELDS = ('id', 'first_name', 'last_name', 'faculty')
+ENROLLMENT_FIELDS = ('id', 'student_id', 'course_id', 'course__slug', 'status', 'enrollment_date')
+
+class BadRequest(Exception):
+    pass
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequest('Некорректный курсор')
+    if not isinstance(values, list) or len(values) != size:
+        raise BadRequest('Некорректный курсор')
+    return values
+
+def keyset_filter(ordering, values):
+    #Условие "строка идет после values" для ordering вида ['title', 'id'] или ['-created_at', 'id']:
+    #a >= x AND ((a > x) OR (a = x AND b > y) OR ...)
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    if len(ordering) > 1:
+        # Отдельная граница по первой колонке: по ней индекс (a, b) начинает
+        # сканирование с курсора, а не с начала
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        condition &= Q(**{f'{first.lstrip("-")}__{lookup}': values[0]})
+    return condition
+
+def keyset_page(request, queryset, fields):
+    #Одна страница и курсор следующей; ordering — Meta.ordering модели + id
+    ordering = [*queryset.model._meta.ordering, 'id']
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    if limit < 1:
+        raise BadRequest('limit должен быть положительным')
+    keys = [field.lstrip('-') for field in ordering]
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, len(ordering))
+        # Курсор приходит от клиента: значения приводятся к типам полей до запроса
+        try:
+            values = [queryset.model._meta.get_field(key).to_python(value) for key, value in zip(keys, values)]
+            queryset = queryset.filter(keyset_filter(ordering, values))
+        except (ValueError, TypeError, ValidationError):
+            raise BadRequest('Некорректный курсор')
+    # Лишняя строка показывает, есть ли следующая страница
+    columns = dict.fromkeys([*fields, *keys])
+    rows = list(queryset.order_by(*ordering).values(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][key] for key in keys])
+    extra = set(keys) - set(fields)
+    results = [{key: value for key, value in row.items() if key not in extra} for row in rows]
+    return results, next_cursor
+
+def choice_filter(request, param, choices):
+    #Фильтр по полю с choices; значение из GET без учета регистра
+    value = request.GET.get(param)
+    if value is None:
+        return Q()
+    value = value.upper()
+    if value not in dict(choices):
+        raise BadRequest(f'Неизвестное значение {param}: {value}')
+    return Q(**{param: value})
+
+def api_view(view_func):
+    #GET-only; BadRequest превращается в ответ 400 с описанием ошибки
+    @require_GET
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({'error': str(error)}, status=400, json_dumps_params={'ensure_ascii': False})
+    return wrapper
+
+def page_response(request, queryset, fields):
+    results, next_cursor = keyset_page(request, queryset, fields)
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return JsonResponse({'results': results, 'next': next_url}, json_dumps_params={'ensure_ascii': False})
+
+@api_view
+def course_list(request):
+    queryset = Course.objects.filter(is_active=True).filter(choice_filter(request, 'level', Course.LEVEL_CHOICES))
+    return page_response(request, queryset, COURSE_FIELDS)
+
+@api_view
+def student_list(request):
+    #Только публичные поля активных студентов
+    queryset = Student.objects.filter(is_active=True).filter(
+        choice_filter(request, 'faculty', Student.FACULTY_CHOICES)
+    )
+    return page_response(request, queryset, STUDENT_FIELDS)
+
+@api_view
+def enrollment_list(request):
+    queryset = Enrollment.objects.filter(student__is_active=True, course__is_active=True).filter(
+        choice_filter(request, 'status', Enrollment.STATUS_CHOICES)
+    )
+    if 'course' in request.GET:
+        queryset = queryset.filter(course__slug=request.GET['course'])
+    if 'student' in request.GET:
+        if not request.GET['student'].isdigit():
+            raise BadRequest('student должен быть числом')
+        queryset = queryset.filter(student_id=request.GET['student'])
+    return page_response(request, queryset, ENROLLMENT_FIELDS)
+
+@api_view
+def course_search(request):
+    #Полнотекстовый поиск активных курсов, самые релевантные первыми
+    query = request.GET.get('q', '').strip()
+    if not query:
+        raise BadRequest('Укажите строку поиска в параметре q')
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    queryset = Course.objects.filter(is_active=True).filter(
+        choice_filter(request, 'level', Course.LEVEL_CHOICES)
+    ).search(query)
+    results = list(queryset.values(*COURSE_FIELDS, 'rank')[:max(limit, 1)])
+    return JsonResponse({'query': query, 'results': results}, json_dumps_params={'ensure_ascii': False})
@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class FefuLabConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'fefu_lab'
\ No newline at end of file
+    name = 'fefu_lab'
+
+    def ready(self):
+        # Подключаем обработчики сигналов кэша статистики, дашборда, счетчика соединений,
+        # метрик и замера запросов
+        from . import stats, dashboard, db_connections, metrics, timing  # noqa: F401
\ No newline at end of file
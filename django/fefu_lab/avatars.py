@@ -0,0 +1,87 @@
+import os
+from io import BytesIO
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Обработка аватаров: изображение проверяется и декодируется один раз,
+# затем из него строятся квадратные миниатюры в WebP и JPEG без метаданных.
+# Оригинал тоже пересохраняется без EXIF: в нём бывают GPS-координаты.
+# Миниатюры лежат рядом с оригиналом: avatars/photo.png -> avatars/photo_128.webp
+
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+ORIGINAL_OPTIONS = {'JPEG': {'quality': 90}, 'WEBP': {'quality': 90}, 'PNG': {'optimize': True}}
+
+def variant_name(name, size, extension):
+    base, _ = os.path.splitext(name)
+    return f'{base}_{size}.{extension}'
+
+def pick_size(size):
+    #Наименьший вариант не меньше запрошенного размера
+    return next((variant for variant in AVATAR_SIZES if variant >= size), AVATAR_SIZES[-1])
+
+def open_avatar(upload):
+    #Проверяет загрузку и возвращает декодированное изображение
+    if upload.size > settings.FEFU_AVATAR_MAX_UPLOAD_SIZE:
+        limit = settings.FEFU_AVATAR_MAX_UPLOAD_SIZE // (1024 * 1024)
+        raise ValidationError(f'Файл слишком большой (максимум {limit} МБ)')
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        if image.format not in ALLOWED_FORMATS:
+            raise ValidationError('Поддерживаются только JPEG, PNG, WebP и GIF')
+        width, height = image.size
+        if width * height > settings.FEFU_AVATAR_MAX_PIXELS:
+            raise ValidationError('Слишком большое разрешение изображения')
+        image.load()
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является корректным изображением')
+    finally:
+        upload.seek(0)
+    # Учитываем поворот из EXIF, сами метаданные в миниатюры не попадают
+    return ImageOps.exif_transpose(image)
+
+def strip_original(image, upload):
+    #Пересохраняет оригинал в исходном формате без EXIF и прочих метаданных
+    upload.seek(0)
+    image_format = Image.open(upload).format
+    upload.seek(0)
+    if image_format == 'JPEG':
+        image = _to_rgb(image)
+    buffer = BytesIO()
+    image.save(buffer, image_format, **ORIGINAL_OPTIONS.get(image_format, {}))
+    return ContentFile(buffer.getvalue(), name=upload.name)
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def save_variants(image, name, storage):
+    #Сохраняет все миниатюры для оригинала с именем name
+    source = _to_rgb(image)
+    for size in AVATAR_SIZES:
+        thumbnail = ImageOps.fit(source, (size, size), Image.LANCZOS)
+        for extension, image_format, options in AVATAR_FORMATS:
+            buffer = BytesIO()
+            thumbnail.save(buffer, image_format, **options)
+            path = variant_name(name, size, extension)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buffer.getvalue()))
+
+def delete_variants(name, storage):
+    for size in AVATAR_SIZES:
+        for extension, _, _ in AVATAR_FORMATS:
+            path = variant_name(name, size, extension)
+            if storage.exists(path):
+                storage.delete(path)
@@ -1,33 +1,57 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
 from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+def get_user_by_login(login, request=None):
+    #Ищет пользователя по email или username одним запросом по индексам lower(...)
+    if not login:
+        return None
+    key = login.lower()
+    # Результат запоминается на запросе, чтобы форма и backend не искали повторно
+    lookups = getattr(request, '_login_lookups', None) if request is not None else None
+    if lookups is not None and key in lookups:
+        return lookups[key]
+    candidates = list(
+        User.objects.annotate(
+            email_lower=Lower('email'),
+            username_lower=Lower('username')
+        ).filter(
+            Q(email_lower=key) | Q(username_lower=key)
+        ).order_by('id')[:2]
+    )
+    user = None
+    if candidates:
+        # Если совпали разные пользователи, приоритет у совпадения по email
+        user = next((c for c in candidates if c.email_lower == key), candidates[0])
+    if request is not None:
+        if lookups is None:
+            lookups = request._login_lookups = {}
+        lookups[key] = user
+        if user is not None:
+            lookups[user.username.lower()] = user
+    return user
 
 
 class EmailBackend(ModelBackend):
     #Кастомный backend для аутентификации по email
     def authenticate(self, request, username=None, password=None, **kwargs):
+        # Ищем пользователя по email или username
+        user = get_user_by_login(username, request)
+        # Проверяем пароль
+        if user and user.check_password(password):
+            return user
+        return None
+    def get_user(self, user_id):
+        # Профиль студента загружается тем же запросом (LEFT JOIN),
+        # поэтому проверки ролей и шаблоны не делают дополнительных запросов
         try:
-            # Ищем пользователя по email или username
-            user = User.objects.get(
-                Q(email__iexact=username) |
-                Q(username__iexact=username)
-            )
-
-            # Проверяем пароль
-            if user.check_password(password):
-                return user
-
+            return User.objects.select_related('student_profile').get(pk=user_id)
         except User.DoesNotExist:
             return None
-
-        except User.MultipleObjectsReturned:
-            # Если несколько пользователей с таким email
-            user = User.objects.filter(email=username).order_by('id').first()
-            if user and user.check_password(password):
-                return user
-        return None
-    def get_user(self, user_id):
+    async def aget_user(self, user_id):
         try:
-            return User.objects.get(pk=user_id)
+            return await User.objects.select_related('student_profile').aget(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,149 @@
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Student, Course, Enrollment, DashboardSnapshot
+
+# Снимок метрик админского дашборда.
+# Полный пересчет - по одному проходу условной агрегации на таблицу,
+# между пересчетами сигналы применяют дельты к последнему снимку.
+# Снимок - одна строка на весь сайт: UPDATE на каждую запись студента или
+# записи на курс выстраивал бы все запросы в очередь за блокировкой этой строки.
+# Поэтому дельты копятся в памяти процесса и применяются одним UPDATE не чаще
+# раза в FEFU_DASHBOARD_FLUSH_INTERVAL секунд (при следующей записи после интервала),
+# а также при чтении дашборда и при завершении воркера. Цена - данные других
+# воркеров видны с задержкой до интервала (или до их следующей записи); при
+# аварийном завершении процесса накопленное теряется до следующего пересчета.
+# Дельта, записанная раньше пересчитанного снимка, в нем уже учтена и отбрасывается.
+
+ROLE_FIELDS = {
+    'STUDENT': 'total_students',
+    'TEACHER': 'total_teachers',
+}
+
+# Дельты после коммита: [(время, {поле: изменение})]
+_pending = []
+_last_flush = 0.0
+_pending_lock = threading.Lock()
+
+def refresh_snapshot():
+    #Пересчитывает все метрики и сохраняет новый снимок
+    with transaction.atomic():
+        students = Student.objects.aggregate(
+            total_students=Count('pk', filter=Q(role='STUDENT')),
+            total_teachers=Count('pk', filter=Q(role='TEACHER')),
+        )
+        courses = Course.objects.aggregate(total_courses=Count('pk'))
+        enrollments = Enrollment.objects.aggregate(
+            total_enrollments=Count('pk'),
+            active_enrollments=Count('pk', filter=Q(status='ACTIVE')),
+        )
+        snapshot = DashboardSnapshot.objects.create(**students, **courses, **enrollments)
+    with _pending_lock:
+        _pending[:] = [entry for entry in _pending if entry[0] > snapshot.created_at]
+    return snapshot
+
+def get_latest_snapshot():
+    flush_deltas()
+    snapshot = DashboardSnapshot.objects.first()
+    if snapshot is None:
+        snapshot = refresh_snapshot()
+    return snapshot
+
+def prune_snapshots(keep):
+    #Удаляет старые снимки, оставляя keep последних
+    stale = DashboardSnapshot.objects.values_list('pk', flat=True)[keep:]
+    return DashboardSnapshot.objects.filter(pk__in=list(stale)).delete()[0]
+
+def apply_delta(**deltas):
+    #Копит изменения счетчиков после коммита; в снимок их переносит flush_deltas
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas or not settings.FEFU_DASHBOARD_INCREMENTAL:
+        return
+    def add():
+        with _pending_lock:
+            _pending.append((timezone.now(), deltas))
+            due = time.monotonic() - _last_flush >= settings.FEFU_DASHBOARD_FLUSH_INTERVAL
+        if due:
+            flush_deltas()
+    transaction.on_commit(add)
+
+def flush_deltas():
+    #Применяет накопленные дельты к последнему снимку одним UPDATE
+    global _last_flush
+    with _pending_lock:
+        pending = _pending[:]
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+    latest = DashboardSnapshot.objects.values_list('pk', 'created_at').first()
+    if latest is None:
+        return 0
+    pk, created_at = latest
+    totals = {}
+    for recorded_at, deltas in pending:
+        # Снимок, пересчитанный позже дельты, уже учитывает ее
+        if recorded_at > created_at:
+            for field, delta in deltas.items():
+                totals[field] = totals.get(field, 0) + delta
+    totals = {field: delta for field, delta in totals.items() if delta}
+    if not totals:
+        return 0
+    return DashboardSnapshot.objects.filter(pk=pk).update(
+        refreshed_at=timezone.now(),
+        **{
+            field: Greatest(F(field) + delta, Value(0))
+            for field, delta in totals.items()
+        }
+    )
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    old_field = None if created else ROLE_FIELDS.get(getattr(instance, '_loaded_role', instance.role))
+    new_field = ROLE_FIELDS.get(instance.role)
+    if old_field != new_field:
+        if old_field:
+            deltas[old_field] = -1
+        if new_field:
+            deltas[new_field] = 1
+    apply_delta(**deltas)
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    field = ROLE_FIELDS.get(getattr(instance, '_loaded_role', instance.role))
+    if field:
+        apply_delta(**{field: -1})
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply_delta(total_courses=1)
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    apply_delta(total_courses=-1)
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_active = not created and getattr(instance, '_loaded_status', None) == 'ACTIVE'
+    is_active = instance.status == 'ACTIVE'
+    apply_delta(
+        total_enrollments=1 if created else 0,
+        active_enrollments=int(is_active) - int(was_active),
+    )
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    was_active = getattr(instance, '_loaded_status', instance.status) == 'ACTIVE'
+    apply_delta(total_enrollments=-1, active_enrollments=-int(was_active))
@@ -0,0 +1,36 @@
+import threading
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Счетчик новых соединений с БД по алиасам. Нужен диагностике (check_db_connections):
+# при постоянных соединениях или пуле новое соединение открывается не на каждый запрос.
+
+_lock = threading.Lock()
+_opened = {}
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    with _lock:
+        _opened[connection.alias] = _opened.get(connection.alias, 0) + 1
+
+def opened_connections(alias='default'):
+    return _opened.get(alias, 0)
+
+def reuses_connections(alias='default'):
+    #Переживает ли соединение конец запроса: CONN_MAX_AGE или пул psycopg
+    settings_dict = connections[alias].settings_dict
+    return bool(settings_dict.get('CONN_MAX_AGE') or settings_dict.get('OPTIONS', {}).get('pool'))
+
+def measure_requests(client, paths, repeat=1):
+    #Открытые соединения на каждый запрос; жизненный цикл соединений как в обработчике
+    #запросов сервера (тестовый клиент отключает close_old_connections)
+    results = []
+    for _ in range(repeat):
+        for path in paths:
+            before = opened_connections()
+            close_old_connections()
+            response = client.get(path)
+            close_old_connections()
+            results.append((path, response.status_code, opened_connections() - before))
+    return results
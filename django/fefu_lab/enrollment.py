@@ -0,0 +1,111 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Now
+from .models import Course, Enrollment, WaitlistEntry
+
+# Запись на курс без глобальной блокировки. Место занимается одним условным UPDATE
+# счетчика Course.active_enrollments (active_enrollments < max_students), поэтому
+# параллельные запросы к одному курсу не могут превысить лимит. Кто не успел,
+# попадает в очередь ожидания; освободившиеся места отдаются ей по порядку (FIFO),
+# и новые записи не обгоняют очередь.
+
+ENROLLED = 'enrolled'
+WAITLISTED = 'waitlisted'
+ALREADY_ENROLLED = 'already_enrolled'
+ALREADY_WAITLISTED = 'already_waitlisted'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+LEFT_WAITLIST = 'left_waitlist'
+NOT_ENROLLED = 'not_enrolled'
+
+def reserve_seat(course_id, skip_waitlist=False):
+    #Занимает место, если оно есть; skip_waitlist - только для продвижения очереди
+    courses = Course.objects.filter(pk=course_id, is_active=True, active_enrollments__lt=F('max_students'))
+    if not skip_waitlist:
+        courses = courses.filter(~Exists(WaitlistEntry.objects.filter(course=OuterRef('pk'))))
+    return courses.update(active_enrollments=F('active_enrollments') + 1, updated_at=Now()) == 1
+
+def activate(student_id, course_id, enrollment=None):
+    #Активная запись на занятое reserve_seat место (новая или отмененная ранее)
+    if enrollment is None:
+        enrollment = Enrollment(student_id=student_id, course_id=course_id)
+    enrollment.status = 'ACTIVE'
+    enrollment._seat_reserved = True
+    try:
+        enrollment.save()
+    finally:
+        del enrollment._seat_reserved
+    return enrollment
+
+def enroll(student, course):
+    try:
+        with transaction.atomic():
+            # Блокируется только строка записи этого студента (повторные клики)
+            enrollment = Enrollment.objects.select_for_update().filter(student=student, course=course).first()
+            if enrollment is not None and enrollment.status == 'ACTIVE':
+                return ALREADY_ENROLLED
+            if enrollment is not None and enrollment.status == 'COMPLETED':
+                return COMPLETED
+            if reserve_seat(course.pk):
+                activate(student.pk, course.pk, enrollment)
+                return ENROLLED
+            _, created = WaitlistEntry.objects.get_or_create(student=student, course=course)
+    except IntegrityError:
+        # Параллельный запрос того же студента создал запись первым (unique_together);
+        # место, занятое этой транзакцией, вернулось при откате
+        if Enrollment.objects.filter(student=student, course=course, status='ACTIVE').exists():
+            return ALREADY_ENROLLED
+        return ALREADY_WAITLISTED
+    # Место могло освободиться, пока студент вставал в очередь
+    if student.pk in promote_waitlist(course.pk):
+        return ENROLLED
+    return WAITLISTED if created else ALREADY_WAITLISTED
+
+def unenroll(student, course):
+    with transaction.atomic():
+        enrollment = Enrollment.objects.select_for_update().filter(
+            student=student, course=course, status='ACTIVE'
+        ).first()
+        if enrollment is None:
+            deleted, _ = WaitlistEntry.objects.filter(student=student, course=course).delete()
+            return LEFT_WAITLIST if deleted else NOT_ENROLLED
+        # Счетчик уменьшают сигналы Enrollment
+        enrollment.status = 'CANCELLED'
+        enrollment.save()
+    promote_waitlist(course.pk)
+    return CANCELLED
+
+def promote_waitlist(course_id):
+    #Отдает свободные места первым в очереди; возвращает id записанных студентов
+    promoted = []
+    while True:
+        with transaction.atomic():
+            entry = WaitlistEntry.objects.select_for_update().filter(course_id=course_id).order_by(
+                'created_at', 'id'
+            ).first()
+            if entry is None and WaitlistEntry.objects.filter(course_id=course_id).exists():
+                # Голову очереди, блокировку которой мы ждали, записал параллельный вызов (PostgreSQL
+                # в READ COMMITTED отдает пустой результат вместо следующей строки) - смотрим заново
+                continue
+            if entry is None or not reserve_seat(course_id, skip_waitlist=True):
+                return promoted
+            enrollment = Enrollment.objects.select_for_update().filter(
+                student_id=entry.student_id, course_id=course_id
+            ).first()
+            activate(entry.student_id, course_id, enrollment)
+            entry.delete()
+        promoted.append(entry.student_id)
+
+async def aget_enrollment_state(student_id, course):
+    #Статус записи студента на курс (ACTIVE, COMPLETED, CANCELLED или None) и место в очереди ожидания
+    status = await Enrollment.objects.filter(student_id=student_id, course=course).values_list(
+        'status', flat=True
+    ).afirst()
+    position = None
+    if status in (None, 'CANCELLED'):
+        entry = await WaitlistEntry.objects.filter(student_id=student_id, course=course).afirst()
+        if entry is not None:
+            position = await WaitlistEntry.objects.filter(course=course).filter(
+                Q(created_at__lt=entry.created_at) | Q(created_at=entry.created_at, id__lt=entry.id)
+            ).acount() + 1
+    return status, position
@@ -0,0 +1,152 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, connections
+from .models import Feedback
+
+# Отложенная запись отзывов. View кладет несохраненный Feedback в ограниченную
+# очередь процесса, фоновый поток пишет их пачками через bulk_create: как только
+# набралось FEFU_FEEDBACK_BATCH_SIZE или прошло FEFU_FEEDBACK_FLUSH_MS с первого
+# отзыва в пачке. Если очередь заполнена, отзыв сохраняется сразу в запросе.
+# При завершении воркера очередь дописывается до конца.
+
+logger = logging.getLogger('fefu_lab.feedback')
+
+# Будит фоновый поток, ожидающий очередь, при остановке
+_STOP = object()
+
+class FeedbackBuffer:
+    def __init__(self, max_size, batch_size, flush_ms):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.stopping = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+
+    def submit(self, feedback):
+        #True, если отзыв поставлен в очередь; False, если сохранен синхронно
+        if self.stopping.is_set():
+            feedback.save()
+            return False
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(feedback)
+        except queue.Full:
+            feedback.save()
+            return False
+        if self.stopping.is_set():
+            # stop() мог дописать очередь раньше, чем в нее попал этот отзыв
+            self.drain()
+        return True
+
+    def ensure_started(self):
+        #Поток в каждом процессе; после fork (preload_app) потока в воркере нет
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self.start_lock:
+            if self.pid != pid:
+                self.thread = threading.Thread(target=self.run, name='fefu-feedback', daemon=True)
+                self.thread.start()
+                self.pid = pid
+
+    def next_batch(self):
+        #Ждет первый отзыв, затем добирает пачку до batch_size или до конца интервала
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                feedback = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if feedback is _STOP:
+                break
+            batch.append(feedback)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def drain(self):
+        #Все, что сейчас в очереди, пачками без ожидания
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    feedback = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if feedback is not _STOP:
+                    batch.append(feedback)
+            if not batch:
+                return
+            self.write(batch)
+
+    def write(self, batch):
+        # Соединение потока подчиняется CONN_MAX_AGE так же, как соединения запросов
+        close_old_connections()
+        try:
+            Feedback.objects.bulk_create(batch)
+        except Exception:
+            logger.exception('Не удалось сохранить пачку из %s отзывов, сохраняем по одному', len(batch))
+            for feedback in batch:
+                try:
+                    feedback.save()
+                except Exception:
+                    logger.exception('Отзыв потерян: %s <%s>', feedback.subject, feedback.email)
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                batch = self.next_batch()
+                if batch:
+                    self.write(batch)
+            self.drain()
+        finally:
+            connections.close_all()
+
+    def stop(self, timeout=10):
+        #Штатное завершение: новые отзывы пишутся синхронно, очередь дописывается
+        self.stopping.set()
+        try:
+            self.queue.put_nowait(_STOP)
+        except queue.Full:
+            # Очередь полна - поток не ждет и сам увидит stopping после пачки
+            pass
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout)
+        # Поток не запускался в этом процессе или не успел
+        self.drain()
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = FeedbackBuffer(settings.FEFU_FEEDBACK_BUFFER_SIZE, settings.FEFU_FEEDBACK_BATCH_SIZE,
+                                         settings.FEFU_FEEDBACK_FLUSH_MS)
+    return _buffer
+
+def submit_feedback(feedback):
+    if settings.FEFU_FEEDBACK_BUFFER_SIZE <= 0:
+        feedback.save()
+        return False
+    return get_buffer().submit(feedback)
+
+def shutdown():
+    if _buffer is not None:
+        _buffer.stop()
+
+# Штатное завершение процесса (SIGTERM воркеру gunicorn); daemon-поток еще жив
+atexit.register(shutdown)
@@ -1,8 +1,11 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from .avatars import open_avatar, strip_original, save_variants, delete_variants
 from .models import UserProfile, Student
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from .backends import get_user_by_login
 
 class CustomUserCreationForm(UserCreationForm):
     #Форма регистрации с email вместо username
@@ -34,6 +37,15 @@ class CustomUserCreationForm(UserCreationForm):
         super().__init__(*args, **kwargs)
         # Убираем username поле
         self.fields.pop('username', None)
+    # Заранее вычисленный хеш пароля (асинхронная регистрация)
+    password_hash = None
+    def set_password_and_save(self, user, commit=True, **kwargs):
+        if self.password_hash is None:
+            return super().set_password_and_save(user, commit=commit, **kwargs)
+        user.password = self.password_hash
+        if commit:
+            user.save()
+        return user
     def save(self, commit=True):
         user = super().save(commit=False)
         # Используем email как username
@@ -65,20 +77,19 @@ class CustomAuthenticationForm(AuthenticationForm):
         self.fields['username'].label = 'Email'
     def clean_username(self):
         username = self.cleaned_data.get('username')
-        # Проверяем что это email или username
-        # Ищем пользователя по email (так как используем email как username)
-        if '@' in username:
-            # Ищем по email
-            try:
-                user = User.objects.get(email=username)
-                return user.username
-            except User.DoesNotExist:
+        # Ищем пользователя по email или username; результат запоминается
+        # на запросе и переиспользуется EmailBackend без повторного запроса
+        user = get_user_by_login(username, self.request)
+        if user is None:
+            if '@' in username:
                 raise ValidationError("Пользователь с таким email не найден")
-        else:
-            # Ищем по username
-            if not User.objects.filter(username=username).exists():
-                raise ValidationError("Пользователь не найден")
-            return username
+            raise ValidationError("Пользователь не найден")
+        return user.username
+
+class AsyncAuthenticationForm(CustomAuthenticationForm):
+    #Форма входа для асинхронного view: пароль проверяется в пуле хеширования
+    def clean(self):
+        return self.cleaned_data
 
 class ProfileUpdateForm(forms.ModelForm):
     #Форма обновления профиля студента
@@ -96,6 +107,12 @@ class ProfileUpdateForm(forms.ModelForm):
         widget=forms.EmailInput(attrs={'class': 'form-control'}),
         label='Email'
     )
+    # FileField вместо ImageField: изображение декодируется один раз в clean_avatar
+    avatar = forms.FileField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'accept': 'image/*'}),
+        label='Аватар'
+    )
     class Meta:
         model = Student
         fields = ['first_name', 'last_name', 'email', 'phone', 'bio', 'avatar', 'faculty']
@@ -107,10 +124,26 @@ class ProfileUpdateForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        self.avatar_image = None
+        self.old_avatar_name = self.instance.avatar.name if self.instance.avatar else None
         if self.instance and self.instance.user:
             self.fields['first_name'].initial = self.instance.user.first_name
             self.fields['last_name'].initial = self.instance.user.last_name
             self.fields['email'].initial = self.instance.user.email
+    def clean_avatar(self):
+        avatar = self.cleaned_data.get('avatar')
+        if isinstance(avatar, UploadedFile):
+            self.avatar_image = open_avatar(avatar)
+            avatar = strip_original(self.avatar_image, avatar)
+        return avatar
+    def save_avatar_variants(self, student):
+        #Строит миниатюры нового аватара и удаляет миниатюры старого
+        if self.avatar_image is None and student.avatar:
+            return
+        if self.old_avatar_name:
+            delete_variants(self.old_avatar_name, student.avatar.storage)
+        if self.avatar_image is not None:
+            save_variants(self.avatar_image, student.avatar.name, student.avatar.storage)
     def save(self, commit=True):
         student = super().save(commit=False)
         # Обновляем связанного User
@@ -122,6 +155,7 @@ class ProfileUpdateForm(forms.ModelForm):
                 student.user.save()
         if commit:
             student.save()
+            self.save_avatar_variants(student)
         return student
 
 class PasswordChangeCustomForm(forms.Form):
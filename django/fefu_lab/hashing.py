@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+# Ограниченный пул потоков для хеширования паролей (PBKDF2) в асинхронных view.
+# Пул размером с число ядер, сверх него допускается ограниченная очередь;
+# при переполнении запрос сразу отклоняется, а event loop продолжает работать.
+
+class HashingPoolSaturated(Exception):
+    #Все слоты пула хеширования заняты
+    pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    #Возвращает (executor, семафор слотов), создавая их при первом обращении
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.FEFU_HASHING_WORKERS
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fefu-hashing')
+                slots = threading.BoundedSemaphore(workers + settings.FEFU_HASHING_QUEUE_DEPTH)
+                _pool = (executor, slots)
+    return _pool
+
+async def run_hashing(func, *args):
+    executor, slots = get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingPoolSaturated
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # Слот освобождает сам поток по окончании хеширования: отмена ожидающей корутины
+    # (клиент отключился) не останавливает уже начатое хеширование
+    future.add_done_callback(lambda _: slots.release())
+    return await asyncio.wrap_future(future)
+
+async def acheck_password(password, user):
+    #Как User.check_password: хеш по устаревшему алгоритму или числу итераций пересохраняется
+    outdated = []
+    password_ok = await run_hashing(check_password, password, user.password, outdated.append)
+    if outdated:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return password_ok
+
+async def amake_password(password):
+    return await run_hashing(make_password, password)
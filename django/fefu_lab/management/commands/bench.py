@@ -0,0 +1,194 @@
+import json
+import math
+import platform
+import statistics
+import time
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from fefu_lab import urls as fefu_urls
+from fefu_lab.models import Course
+
+# Маршруты, которые не замеряются, и причина
+SKIPPED_ROUTES = {
+    'logout': 'завершает сессию клиента',
+    'course_enroll': 'только POST, меняет данные',
+    'course_unenroll': 'только POST, меняет данные',
+    'password_reset': 'нет шаблона fefu_lab/registration/password_reset.html',
+    'password_reset_done': 'нет шаблона fefu_lab/registration/password_reset_done.html',
+    'password_reset_confirm': 'нет шаблона fefu_lab/registration/password_reset_confirm.html',
+    'password_reset_complete': 'нет шаблона fefu_lab/registration/password_reset_complete.html',
+}
+
+def percentile(sorted_values, fraction):
+    #Перцентиль по ближайшему рангу
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер всех страниц fefu_lab под анонимом, студентом, преподавателем '
+            'и администратором: задержка p50/p95/p99, SQL-запросы и размер ответа. '
+            'Данные генерируются и откатываются; результат сравнивается с базовым')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200, help='Студентов в наборе данных (по умолчанию 200)')
+        parser.add_argument('--courses', type=int, default=20, help='Курсов в наборе данных (по умолчанию 20)')
+        parser.add_argument('--enrollments-per-student', type=int, default=3, help='Записей на студента')
+        parser.add_argument('--seed', type=int, default=9001, help='Зерно генератора данных')
+        parser.add_argument('--iterations', type=int, default=30, help='Замеров на маршрут (по умолчанию 30)')
+        parser.add_argument('--warmup', type=int, default=3, help='Незамеряемых запросов перед замером')
+        parser.add_argument('--output', default='bench-results.json', help='Файл для JSON-результатов')
+        parser.add_argument('--baseline', help='JSON-файл базовых результатов для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95 относительно базового (по умолчанию 0.2 = 20%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Рост p95 меньше этого значения не считается регрессией (шум)')
+
+    def handle(self, *args, **options):
+        # Отдельный кэш в памяти: данные замера не попадают в рабочий кэш
+        with transaction.atomic(), override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'fefu-lab-bench'}},
+        ):
+            started = time.perf_counter()
+            call_command('seed_data', students=options['students'], courses=options['courses'],
+                         enrollments_per_student=options['enrollments_per_student'],
+                         seed=options['seed'], stdout=StringIO())
+            self.stdout.write(f'Данные: {options["students"]} студентов, {options["courses"]} курсов '
+                              f'за {time.perf_counter() - started:.1f} с')
+            routes = self.get_routes(options['seed'])
+            self.check_coverage(routes)
+            results = {}
+            for role, name, url in routes:
+                client = self.client_for(role)
+                result = self.measure(client, url, options['warmup'], options['iterations'])
+                key = f'{role or "anonymous"} {name}'
+                results[key] = result
+                self.stdout.write(
+                    f'{key:<40} [{result["status"]}] p50={result["p50_ms"]:.1f} p95={result["p95_ms"]:.1f} '
+                    f'p99={result["p99_ms"]:.1f} мс, запросов {result["queries"]}, {result["bytes"]} байт'
+                )
+            transaction.set_rollback(True)
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'students': options['students'],
+                'courses': options['courses'],
+                'enrollments_per_student': options['enrollments_per_student'],
+                'iterations': options['iterations'],
+            },
+            'routes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+        if options['baseline']:
+            self.compare(results, options)
+
+    def get_routes(self, seed):
+        #(роль, имя маршрута, URL) для каждого маршрута fefu_lab.urls
+        course = Course.objects.filter(is_active=True, slug__startswith=f'seed{seed}-').first()
+        self.users = {
+            'STUDENT': User.objects.get(username=f'student0@seed{seed}.fefu.ru'),
+            'TEACHER': User.objects.get(username=f'teacher0@seed{seed}.fefu.ru'),
+            'ADMIN': User.objects.create_user(username=f'admin@seed{seed}.fefu.ru', is_staff=True),
+        }
+        self.clients = {}
+        student = self.users['STUDENT'].student_profile
+        return [
+            (None, 'home', reverse('home')),
+            (None, 'about', reverse('about')),
+            (None, 'course_detail', reverse('course_detail', kwargs={'course_slug': course.slug})),
+            (None, 'student_profile', reverse('student_profile', kwargs={'student_id': student.pk})),
+            (None, 'feedback', reverse('feedback')),
+            (None, 'register', reverse('register')),
+            (None, 'login', reverse('login')),
+            (None, 'api_course_list', reverse('api_course_list')),
+            (None, 'api_student_list', reverse('api_student_list')),
+            (None, 'api_enrollment_list', reverse('api_enrollment_list') + '?status=active'),
+            (None, 'course_search', reverse('course_search') + '?q=python'),
+            ('STUDENT', 'home', reverse('home')),
+            ('STUDENT', 'course_detail', reverse('course_detail', kwargs={'course_slug': course.slug})),
+            ('STUDENT', 'profile', reverse('profile')),
+            ('STUDENT', 'profile_edit', reverse('profile_edit')),
+            ('STUDENT', 'password_change', reverse('password_change')),
+            ('STUDENT', 'protected_page', reverse('protected_page')),
+            ('TEACHER', 'profile', reverse('profile')),
+            ('TEACHER', 'teacher_dashboard', reverse('teacher_dashboard')),
+            ('ADMIN', 'admin_dashboard', reverse('admin_dashboard')),
+            ('ADMIN', 'staff_only', reverse('staff_only')),
+        ]
+
+    def check_coverage(self, routes):
+        covered = {name for _, name, _ in routes}
+        names = {pattern.name for pattern in fefu_urls.urlpatterns if pattern.name}
+        missing = names - covered - set(SKIPPED_ROUTES)
+        if missing:
+            raise CommandError(f'Маршруты без замера: {", ".join(sorted(missing))}')
+        for name, reason in SKIPPED_ROUTES.items():
+            self.stdout.write(self.style.WARNING(f'Пропущен {name}: {reason}'))
+
+    def client_for(self, role):
+        if role not in self.clients:
+            # Ошибка страницы попадает в отчет статусом 500, а не прерывает замер
+            client = Client(raise_request_exception=False)
+            if role:
+                client.force_login(self.users[role])
+            self.clients[role] = client
+        return self.clients[role]
+
+    def measure(self, client, url, warmup, iterations):
+        for _ in range(warmup):
+            client.get(url)
+        timings = []
+        queries = []
+        sizes = []
+        status = None
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+            sizes.append(len(response.content))
+            status = response.status_code
+        timings.sort()
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries': max(queries),
+            'bytes': int(statistics.median(sizes)),
+        }
+
+    def compare(self, results, options):
+        with open(options['baseline'], encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['routes']
+        regressions = []
+        for key, result in results.items():
+            base = baseline.get(key)
+            if base is None:
+                self.stdout.write(self.style.WARNING(f'{key}: нет в базовых результатах'))
+                continue
+            limit = base['p95_ms'] * (1 + options['threshold'])
+            if result['p95_ms'] > limit and result['p95_ms'] - base['p95_ms'] > options['min_delta_ms']:
+                regressions.append(f'{key}: p95 {base["p95_ms"]:.1f} -> {result["p95_ms"]:.1f} мс')
+            if result['queries'] > base['queries']:
+                regressions.append(f'{key}: запросов {base["queries"]} -> {result["queries"]}')
+            if result['status'] != base['status']:
+                regressions.append(f'{key}: статус {base["status"]} -> {result["status"]}')
+        if regressions:
+            raise CommandError('Регрессии относительно базовых результатов:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий относительно базовых результатов нет'))
@@ -0,0 +1,65 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from fefu_lab.models import Course
+
+WORDS = [
+    'программирование', 'python', 'django', 'базы', 'данных', 'алгоритмы', 'сети', 'безопасность',
+    'машинное', 'обучение', 'анализ', 'веб', 'разработка', 'интерфейсы', 'тестирование', 'облачные',
+    'вычисления', 'криптография', 'математика', 'статистика', 'проектирование', 'архитектура',
+    'системы', 'операционные', 'компиляторы', 'графика', 'мобильные', 'приложения', 'нейронные', 'модели',
+]
+QUERIES = ['python', 'базы данных', 'машинного обучения', 'безопасность сетей', 'веб-разработка',
+           'алгоритмы', 'архитектура систем', 'нейронные сети']
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку полнотекстового поиска курсов с ILIKE-поиском '
+            'на большом сгенерированном каталоге (данные откатываются)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=20000, help='Курсов в каталоге (по умолчанию 20000)')
+        parser.add_argument('--iterations', type=int, default=50, help='Повторов каждого запроса')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора описаний')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            started = time.perf_counter()
+            Course.objects.bulk_create([
+                Course(
+                    title=f'Курс {index}: {" ".join(rng.sample(WORDS, 3))}',
+                    slug=f'bench-course-{index}',
+                    # Темы из словаря среди "шума", чтобы запросы находили часть каталога
+                    description=' '.join(rng.sample(WORDS, 4) + [f'слово{rng.randrange(50000)}' for _ in range(80)]),
+                    duration=rng.randint(10, 200),
+                )
+                for index in range(options['courses'])
+            ], batch_size=1000)
+            self.stdout.write(f'Каталог: {options["courses"]} курсов за {time.perf_counter() - started:.1f} с '
+                              f'({connection.vendor})')
+            for label, search in (('полнотекстовый', self.full_text), ('ILIKE', self.ilike)):
+                timings = []
+                found = 0
+                for _ in range(options['iterations']):
+                    for query in QUERIES:
+                        started = time.perf_counter()
+                        found += len(search(query))
+                        timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(f'{label}: p50={statistics.median(timings):.2f} мс, p95={p95:.2f} мс, '
+                                  f'найдено в среднем {found / len(timings):.1f}')
+            transaction.set_rollback(True)
+
+    def full_text(self, query):
+        return list(Course.objects.search(query).values_list('id', flat=True)[:20])
+
+    def ilike(self, query):
+        # Так искала админка через search_fields = ['title', 'description']
+        condition = Q()
+        for word in query.split():
+            condition &= Q(title__icontains=word) | Q(description__icontains=word)
+        return list(Course.objects.filter(condition).values_list('id', flat=True)[:20])
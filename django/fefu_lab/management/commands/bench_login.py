@@ -0,0 +1,53 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+class Command(BaseCommand):
+    help = 'Измеряет число SQL-запросов и время POST /login/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Количество входов (по умолчанию 20)')
+        parser.add_argument('--password', default='bench-password-123', help='Пароль тестового пользователя')
+
+    def handle(self, *args, **options):
+        email = 'bench.login@fefu.ru'
+        timings = []
+        query_counts = []
+        lookup_counts = []
+        # Тестовый пользователь и сессии откатываются после замера
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            User.objects.create_user(username=email, email=email, password=options['password'])
+            url = reverse('login')
+            for _ in range(options['iterations']):
+                client = Client()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.post(url, {
+                        # Смешанный регистр проверяет регистронезависимый поиск
+                        'username': email.upper(),
+                        'password': options['password'],
+                    })
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 302:
+                    self.stderr.write(self.style.ERROR(f'Вход не удался: HTTP {response.status_code}'))
+                    break
+                query_counts.append(len(captured.captured_queries))
+                lookup_counts.append(sum(
+                    1 for query in captured.captured_queries
+                    if query['sql'].startswith('SELECT') and 'FROM "auth_user"' in query['sql']
+                ))
+            transaction.set_rollback(True)
+        if not timings:
+            return
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f'Входов: {len(timings)}')
+        self.stdout.write(f'SQL-запросов на вход: {max(query_counts, default=0)} '
+                          f'(из них поиск пользователя: {max(lookup_counts, default=0)})')
+        self.stdout.write(f'Время: p50={statistics.median(timings):.1f} мс, p95={p95:.1f} мс, '
+                          f'среднее={statistics.mean(timings):.1f} мс')
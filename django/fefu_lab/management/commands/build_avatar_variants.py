@@ -0,0 +1,20 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from fefu_lab.avatars import open_avatar, save_variants
+from fefu_lab.models import Student
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для уже загруженных аватаров'
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for student in Student.objects.exclude(avatar='').exclude(avatar__isnull=True).iterator():
+            try:
+                with student.avatar.open('rb') as upload:
+                    image = open_avatar(upload)
+                save_variants(image, student.avatar.name, student.avatar.storage)
+                built += 1
+            except (OSError, ValidationError) as error:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'✗ {student.avatar.name}: {error}'))
+        self.stdout.write(self.style.SUCCESS(f'Обработано аватаров: {built}, с ошибками: {failed}'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from fefu_lab.db_connections import measure_requests, reuses_connections
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько соединений с БД открывается на запрос при текущих настройках'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths', help='Путь для запроса (можно повторять)')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз пройти по путям (по умолчанию 5)')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        pool = settings_dict.get('OPTIONS', {}).get('pool')
+        self.stdout.write(f'БД: {connection.vendor}, CONN_MAX_AGE={settings_dict.get("CONN_MAX_AGE")}, '
+                          f'CONN_HEALTH_CHECKS={settings_dict.get("CONN_HEALTH_CHECKS")}, пул: {pool or "нет"}')
+        paths = options['paths'] or ['/', '/about/']
+        # Кэш отключаем, чтобы каждый запрос действительно ходил в БД
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        ):
+            results = measure_requests(Client(), paths, options['repeat'])
+        for path, status, opened in results:
+            self.stdout.write(f'{path} [{status}]: открыто соединений {opened}')
+        # Первый запрос открывает соединение в любом режиме
+        opened = sum(count for _, _, count in results[1:])
+        per_request = opened / max(len(results) - 1, 1)
+        self.stdout.write(f'Новых соединений на запрос (без первого): {per_request:.2f}')
+        if reuses_connections() and opened:
+            self.stdout.write(self.style.WARNING('Соединения не переиспользуются, хотя это включено в настройках'))
+        elif reuses_connections():
+            self.stdout.write(self.style.SUCCESS('Соединения переиспользуются между запросами'))
@@ -0,0 +1,131 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from fefu_lab.models import Student, Course
+from fefu_lab.dashboard import refresh_snapshot
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов каждой страницы fefu_lab '
+            'и падает, если какой-либо запрос читает таблицу последовательным сканированием')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--allow-table',
+            action='append',
+            default=[],
+            dest='allowed_tables',
+            help='Таблица, для которой полное сканирование допустимо (можно повторять)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'EXPLAIN не поддерживается для {connection.vendor}')
+        self.tables = set(connection.introspection.table_names()) - set(options['allowed_tables'])
+        problems = []
+        # Все изменения (сессии входа, снимок дашборда) откатываются в конце
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Без seq scan планировщик обязан выбрать индекс, если он применим
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            refresh_snapshot()
+            # Кэш отключаем, чтобы каждая страница действительно ходила в БД
+            with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ):
+                for role, url in self.get_routes():
+                    for sql, plan in self.explain_route(role, url):
+                        scanned = self.find_seq_scans(plan)
+                        self.stdout.write(f'{"✗" if scanned else "✓"} [{role or "anonymous"}] {url}: {sql[:100]}')
+                        if scanned:
+                            problems.append((role, url, sql, scanned))
+            transaction.set_rollback(True)
+        if problems:
+            lines = [
+                f'[{role or "anonymous"}] {url}: {", ".join(sorted(tables))}\n    {sql}'
+                for role, url, sql, tables in problems
+            ]
+            raise CommandError('Последовательное сканирование:\n' + '\n'.join(lines))
+        self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
+
+    def get_routes(self):
+        #Страницы fefu_lab с ролью, под которой их нужно открыть
+        routes = [
+            (None, reverse('home')),
+            (None, reverse('about')),
+        ]
+        course = Course.objects.filter(is_active=True).first()
+        if course:
+            routes.append((None, reverse('course_detail', kwargs={'course_slug': course.slug})))
+        student = Student.objects.filter(is_active=True).first()
+        if student:
+            routes.append((None, reverse('student_profile', kwargs={'student_id': student.pk})))
+        # Вторая страница API проверяет условие keyset-курсора. Записи без фильтра
+        # идут по первичному ключу, что SQLite показывает как SCAN, поэтому берем статус
+        for url in (reverse('api_course_list'), reverse('api_student_list'),
+                    reverse('api_enrollment_list') + '?status=active'):
+            url += ('&' if '?' in url else '?') + 'limit=1'
+            routes += [(None, url), (None, self.next_page(url))]
+        routes.append((None, reverse('course_search') + '?q=курс'))
+        routes += [
+            ('STUDENT', reverse('profile')),
+            ('TEACHER', reverse('profile')),
+            ('TEACHER', reverse('teacher_dashboard')),
+            ('ADMIN', reverse('admin_dashboard')),
+        ]
+        return routes
+
+    def next_page(self, url):
+        next_url = Client().get(url).json()['next']
+        return next_url.removeprefix('http://testserver') if next_url else url
+
+    def explain_route(self, role, url):
+        client = Client()
+        if role:
+            profile = Student.objects.filter(role=role, user__isnull=False).select_related('user').first()
+            if profile is None:
+                self.stdout.write(self.style.WARNING(f'Нет пользователя с ролью {role}, пропускаю {url}'))
+                return []
+            client.force_login(profile.user)
+        with CaptureQueriesContext(connection) as captured:
+            client.get(url)
+        return [
+            (query['sql'], self.explain(query['sql']))
+            for query in captured.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                return cursor.fetchone()[0]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def find_seq_scans(self, plan):
+        #Возвращает таблицы, которые план читает целиком
+        if connection.vendor == 'postgresql':
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = [plan[0]['Plan']]
+            scanned = set()
+            while nodes:
+                node = nodes.pop()
+                if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in self.tables:
+                    scanned.add(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return scanned
+        # SQLite: "SCAN table" без "USING ... INDEX" означает полный проход по таблице
+        scanned = set()
+        for detail in plan:
+            words = detail.split()
+            # Виртуальные таблицы (FTS5) читаются через свой индекс
+            if len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words and 'VIRTUAL' not in words:
+                if words[1] in self.tables:
+                    scanned.add(words[1])
+        return scanned
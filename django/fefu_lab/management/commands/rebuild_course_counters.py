@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fefu_lab.models import Course
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики активных записей на курсы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--slug',
+            action='append',
+            dest='slugs',
+            help='Пересчитать только указанные курсы (можно повторять)'
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['slugs']:
+            courses = courses.filter(slug__in=options['slugs'])
+        with transaction.atomic():
+            # Блокируем строки курсов, чтобы не потерять параллельные изменения
+            list(courses.select_for_update().values_list('pk', flat=True))
+            updated = Course.rebuild_active_enrollments(courses)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано курсов: {updated}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from fefu_lab.dashboard import refresh_snapshot, prune_snapshots
+
+class Command(BaseCommand):
+    help = 'Пересчитывает снимок метрик админского дашборда'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=10,
+            help='Сколько последних снимков хранить (по умолчанию 10)'
+        )
+
+    def handle(self, *args, **options):
+        snapshot = refresh_snapshot()
+        removed = prune_snapshots(max(options['keep'], 1))
+        self.stdout.write(
+            f'Студентов: {snapshot.total_students}, преподавателей: {snapshot.total_teachers}, '
+            f'курсов: {snapshot.total_courses}, записей: {snapshot.total_enrollments} '
+            f'(активных: {snapshot.active_enrollments})'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{snapshot}. Удалено старых снимков: {removed}'))
@@ -1,14 +1,44 @@
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models.signals import post_save
 from fefu_lab.models import Student, Instructor, Course, Enrollment
+from fefu_lab.dashboard import refresh_snapshot
+from fefu_lab.stats import bump_version
+from contextlib import contextmanager
 from datetime import date
 import random
+import time
+
+FIRST_NAMES = ['Анна', 'Дмитрий', 'Екатерина', 'Михаил', 'Ольга', 'Иван', 'Мария', 'Алексей',
+               'Софья', 'Никита', 'Полина', 'Артем', 'Дарья', 'Егор', 'Виктория', 'Кирилл']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Попов', 'Васильев', 'Новиков', 'Петров', 'Сидоров', 'Козлов',
+              'Морозов', 'Волков', 'Соловьев', 'Лебедев', 'Федоров', 'Орлов', 'Егоров', 'Зайцев']
+SPECIALIZATIONS = ['Кибербезопасность', 'Веб-разработка', 'Сетевые технологии', 'Базы данных',
+                   'Машинное обучение', 'Алгоритмы']
+TOPICS = ['Python', 'Django', 'SQL', 'сети', 'криптография', 'алгоритмы', 'машинное обучение',
+          'анализ данных', 'веб-интерфейсы', 'тестирование', 'облачные вычисления', 'Linux']
+STATUS_WEIGHTS = (('ACTIVE', 7), ('COMPLETED', 2), ('CANCELLED', 1))
 
 class Command(BaseCommand):
-    help = 'Заполняет базу данных тестовыми данными'
+    help = ('Заполняет базу данных тестовыми данными. С --students генерирует '
+            'большой детерминированный набор данных для нагрузочного тестирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, help='Массовый режим: количество студентов')
+        parser.add_argument('--courses', type=int, default=100, help='Количество курсов (по умолчанию 100)')
+        parser.add_argument('--instructors', type=int, help='Количество преподавателей (по умолчанию курсы / 10)')
+        parser.add_argument('--enrollments-per-student', type=int, default=3,
+                            help='Записей на курсы у каждого студента (по умолчанию 3)')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора (по умолчанию 42)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Строк в одном INSERT (по умолчанию 5000)')
+        parser.add_argument('--password', default='student123', help='Пароль всех сгенерированных пользователей')
+        parser.add_argument('--clear', action='store_true', help='Удалить существующие данные перед генерацией')
 
     def handle(self, *args, **options):
+        if options['students'] is not None:
+            return self.handle_bulk(options)
         self.stdout.write('Начинаю заполнение базы данных...')
         # Отключаем сигналы
         from fefu_lab.models import create_student_profile, save_student_profile
@@ -76,9 +106,19 @@ class Command(BaseCommand):
                     last_name=last_name,
                     is_active=True
                 )
-                # Создаём Student с ролью TEACHER
+                # Создаём Instructor для курсов
+                instructor = Instructor.objects.create(
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=email,
+                    specialization=specialization,
+                    degree=degree,
+                    is_active=True
+                )
+                # Создаём Student с ролью TEACHER и связываем с Instructor
                 Student.objects.create(
                     user=user,
+                    instructor=instructor,
                     first_name=first_name,
                     last_name=last_name,
                     email=email,
@@ -88,15 +128,6 @@ class Command(BaseCommand):
                     bio=f'Преподаватель {specialization}',
                     is_active=True
                 )
-                # Создаём Instructor для курсов
-                instructor = Instructor.objects.create(
-                    first_name=first_name,
-                    last_name=last_name,
-                    email=email,
-                    specialization=specialization,
-                    degree=degree,
-                    is_active=True
-                )
                 instructors.append(instructor)
                 self.stdout.write(f'✓ Преподаватель: {email} / {password}')
             # 5. Создаем курсы
@@ -175,4 +206,115 @@ class Command(BaseCommand):
             post_save.connect(create_student_profile, sender=User)
             post_save.connect(save_student_profile, sender=User)
             self.stdout.write(self.style.ERROR(f'❌ ОШИБКА: {e}'))
-            raise
\ No newline at end of file
+            raise
+
+    def handle_bulk(self, options):
+        #Массовая генерация: один хеш пароля на всех, bulk_create пачками,
+        #каждая пачка в своей транзакции. Сигналы bulk_create не вызывает,
+        #поэтому счетчики, снимок дашборда и версии кэша обновляются в конце
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        total_students = options['students']
+        total_courses = max(options['courses'], 1)
+        total_instructors = options['instructors'] or max(total_courses // 10, 1)
+        per_student = min(options['enrollments_per_student'], total_courses)
+        tag = f'seed{options["seed"]}'
+        started = time.perf_counter()
+        if options['clear']:
+            self.stdout.write('Очистка старых данных...')
+            with transaction.atomic():
+                # Записи и профили удаляем одним DELETE без загрузки объектов для сигналов:
+                # счетчики и снимок все равно пересчитываются в конце
+                Enrollment.objects.all()._raw_delete(Enrollment.objects.db)
+                Student.objects.all()._raw_delete(Student.objects.db)
+                Course.objects.all().delete()
+                Instructor.objects.all().delete()
+                User.objects.filter(is_superuser=False).delete()
+        password = make_password(options['password'])
+
+        # Преподаватели: Instructor + пользователь с профилем роли TEACHER
+        with self.phase('Преподаватели', total_instructors):
+            with transaction.atomic():
+                instructors = Instructor.objects.bulk_create([
+                    Instructor(
+                        first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                        email=f'teacher{index}@{tag}.fefu.ru', specialization=rng.choice(SPECIALIZATIONS),
+                    )
+                    for index in range(total_instructors)
+                ], batch_size=batch_size)
+                users = User.objects.bulk_create([
+                    User(username=instructor.email, email=instructor.email, password=password,
+                         first_name=instructor.first_name, last_name=instructor.last_name)
+                    for instructor in instructors
+                ], batch_size=batch_size)
+                Student.objects.bulk_create([
+                    Student(user=user, instructor=instructor, first_name=user.first_name,
+                            last_name=user.last_name, email=user.email, role='TEACHER')
+                    for user, instructor in zip(users, instructors)
+                ], batch_size=batch_size)
+
+        # Вместимость с запасом, чтобы активные записи помещались в курсы
+        capacity = max(30, total_students * per_student * 2 // total_courses)
+        with self.phase('Курсы', total_courses):
+            with transaction.atomic():
+                courses = Course.objects.bulk_create([
+                    Course(
+                        title=f'{rng.choice(TOPICS).capitalize()}: курс {index}',
+                        slug=f'{tag}-course-{index}',
+                        description=f'Курс о темах: {", ".join(rng.sample(TOPICS, 3))}',
+                        duration=rng.randint(16, 120),
+                        instructor=rng.choice(instructors),
+                        level=rng.choice(Course.LEVEL_CHOICES)[0],
+                        max_students=capacity,
+                        price=rng.choice([0, 5000, 12000, 15000]),
+                    )
+                    for index in range(total_courses)
+                ], batch_size=batch_size)
+        course_ids = [course.pk for course in courses]
+
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        weights = [weight for _, weight in STATUS_WEIGHTS]
+        faculties = [code for code, _ in Student.FACULTY_CHOICES]
+        with self.phase('Студенты и записи', total_students * (2 + per_student)):
+            for offset in range(0, total_students, batch_size):
+                count = min(batch_size, total_students - offset)
+                with transaction.atomic():
+                    users = User.objects.bulk_create([
+                        User(username=f'student{index}@{tag}.fefu.ru', email=f'student{index}@{tag}.fefu.ru',
+                             password=password, first_name=rng.choice(FIRST_NAMES),
+                             last_name=rng.choice(LAST_NAMES))
+                        for index in range(offset, offset + count)
+                    ])
+                    students = Student.objects.bulk_create([
+                        Student(user=user, first_name=user.first_name, last_name=user.last_name,
+                                email=user.email, faculty=rng.choice(faculties),
+                                birth_date=date(rng.randint(1995, 2006), rng.randint(1, 12), rng.randint(1, 28)))
+                        for user in users
+                    ])
+                    Enrollment.objects.bulk_create([
+                        Enrollment(student=student, course_id=course_id, status=status)
+                        for student in students
+                        for course_id, status in zip(
+                            rng.sample(course_ids, per_student),
+                            rng.choices(statuses, weights, k=per_student),
+                        )
+                    ], batch_size=batch_size)
+                self.stdout.write(f'  {offset + count}/{total_students}')
+
+        with self.phase('Счетчики, снимок дашборда', total_courses):
+            Course.rebuild_active_enrollments()
+            refresh_snapshot()
+            for model in (Student, Course, Instructor, Enrollment):
+                bump_version(model)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с. Пароль всех пользователей: {options["password"]}, '
+            f'логины student<N>@{tag}.fefu.ru и teacher<N>@{tag}.fefu.ru'
+        ))
+
+    @contextmanager
+    def phase(self, label, rows):
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label}: {rows} строк за {elapsed:.1f} с ({rows / max(elapsed, 1e-6):.0f} строк/с)')
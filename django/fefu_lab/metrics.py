@@ -0,0 +1,179 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# Метрики приложения в формате Prometheus: задержка запросов по имени маршрута,
+# время SQL, попадания в кэш, входы. Под gunicorn каждый воркер пишет значения
+# в свои файлы в PROMETHEUS_MULTIPROC_DIR (задается в deploy/gunicorn/config.py),
+# /metrics суммирует файлы всех воркеров.
+# Запрос только добавляет наблюдение в deque (append атомарен, без блокировок);
+# в метрики prometheus_client их переносит фоновый поток воркера, а если он
+# не успевает, то сам запрос, добавивший FEFU_METRICS_MAX_PENDING-е наблюдение.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'fefu_http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    'fefu_http_request_db_seconds', 'Суммарное время SQL-запросов за HTTP-запрос',
+    ['route'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter('fefu_db_queries', 'SQL-запросы', ['route'])
+CACHE_REQUESTS = Counter('fefu_cache_requests', 'Обращения к кэшу', ['cache', 'result'])
+LOGINS = Counter('fefu_logins', 'Попытки входа', ['result'])
+
+_pending = deque()
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+def record(metric, labels, value=1):
+    #Наблюдение для Histogram или прибавка для Counter
+    _pending.append((metric, labels, value))
+    # Фоновый поток отстал: переносим сами, а не теряем наблюдения под нагрузкой
+    if len(_pending) >= settings.FEFU_METRICS_MAX_PENDING:
+        flush()
+
+def record_cache(name, hit):
+    record(CACHE_REQUESTS, (name, 'hit' if hit else 'miss'))
+
+def flush():
+    #Переносит накопленные наблюдения в метрики; безопасно из нескольких потоков
+    while True:
+        try:
+            metric, labels, value = _pending.popleft()
+        except IndexError:
+            return
+        child = metric.labels(*labels)
+        if isinstance(metric, Histogram):
+            child.observe(value)
+        else:
+            child.inc(value)
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.FEFU_METRICS_FLUSH_INTERVAL)
+        flush()
+
+def ensure_flusher():
+    #Фоновый поток в каждом процессе; после fork (preload_app) потока в воркере нет
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _flusher_lock:
+        if _flusher_pid != pid:
+            threading.Thread(target=_flush_loop, name='fefu-metrics', daemon=True).start()
+            _flusher_pid = pid
+
+# Остаток при штатном завершении воркера
+atexit.register(flush)
+
+class QueryTimer:
+    def __init__(self):
+        self.seconds = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+# Счетчик SQL текущего запроса; как и в timing.py, ContextVar доходит до потоков
+# sync_to_async, а соединения привязаны к потоку
+_query_timer = ContextVar('fefu_lab_metrics_queries', default=None)
+
+def time_query(execute, sql, params, many, context):
+    timer = _query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+def route_label(request):
+    #Имя маршрута, а не путь: число значений метки не зависит от id и slug в URL
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+class MetricsMiddleware:
+    # Первый в MIDDLEWARE: под ASGI не должен переводить цепочку в поток
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        ensure_flusher()
+        timer = QueryTimer()
+        token = _query_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_timer.reset(token)
+        return self.finish(request, response, started, timer)
+
+    async def __acall__(self, request):
+        ensure_flusher()
+        timer = QueryTimer()
+        token = _query_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_timer.reset(token)
+        return self.finish(request, response, started, timer)
+
+    def finish(self, request, response, started, timer):
+        duration = time.perf_counter() - started
+        route = route_label(request)
+        record(REQUEST_LATENCY, (route, request.method, f'{response.status_code // 100}xx'), duration)
+        record(REQUEST_DB_TIME, (route,), timer.seconds)
+        if timer.count:
+            record(DB_QUERIES, (route,), timer.count)
+        return response
+
+@receiver(user_logged_in)
+def count_login(sender, **kwargs):
+    record(LOGINS, ('success',))
+
+@receiver(user_login_failed)
+def count_failed_login(sender, **kwargs):
+    record(LOGINS, ('failure',))
+
+@require_GET
+def metrics_view(request):
+    flush()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
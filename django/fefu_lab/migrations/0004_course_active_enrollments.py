@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_active_enrollments(apps, schema_editor):
+    Course = apps.get_model('fefu_lab', 'Course')
+    Enrollment = apps.get_model('fefu_lab', 'Enrollment')
+    active_count = Enrollment.objects.filter(
+        course=OuterRef('pk'),
+        status='ACTIVE'
+    ).order_by().values('course').annotate(total=Count('pk')).values('total')
+    Course.objects.update(active_enrollments=Coalesce(Subquery(active_count), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0003_student_avatar_student_bio_student_phone_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_enrollments',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных записей'),
+        ),
+        migrations.RunPython(fill_active_enrollments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0004_course_active_enrollments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_students', models.PositiveIntegerField(default=0, verbose_name='Студентов')),
+                ('total_teachers', models.PositiveIntegerField(default=0, verbose_name='Преподавателей')),
+                ('total_courses', models.PositiveIntegerField(default=0, verbose_name='Курсов')),
+                ('total_enrollments', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+                ('active_enrollments', models.PositiveIntegerField(default=0, verbose_name='Активных записей')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата снимка')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Снимок дашборда',
+                'verbose_name_plural': 'Снимки дашборда',
+                'ordering': ['-created_at'],
+                'get_latest_by': 'created_at',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_instructors_by_email(apps, schema_editor):
+    Student = apps.get_model('fefu_lab', 'Student')
+    Instructor = apps.get_model('fefu_lab', 'Instructor')
+    matching = Instructor.objects.filter(email=OuterRef('email')).values('pk')[:1]
+    Student.objects.filter(
+        instructor__isnull=True,
+        email__in=Instructor.objects.values('email')
+    ).update(instructor=Subquery(matching))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0005_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='instructor',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='student_profile', to='fefu_lab.instructor', verbose_name='Преподаватель'),
+        ),
+        migrations.RunPython(link_instructors_by_email, migrations.RunPython.noop),
+    ]
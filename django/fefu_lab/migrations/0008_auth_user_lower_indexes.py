@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:12
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+# Функциональные индексы для регистронезависимого входа (EmailBackend).
+# auth_user принадлежит django.contrib.auth, поэтому индексы создаются здесь.
+LOWER_INDEXES = [
+    models.Index(Lower('email'), name='auth_user_lower_email_idx'),
+    models.Index(Lower('username'), name='auth_user_lower_username_idx'),
+]
+
+
+def add_lower_indexes(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for index in LOWER_INDEXES:
+        schema_editor.add_index(User, index)
+
+
+def remove_lower_indexes(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for index in LOWER_INDEXES:
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0007_query_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_lower_indexes, remove_lower_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0011_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='fefu_lab.course', verbose_name='Курс')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='fefu_lab.student', verbose_name='Студент')),
+            ],
+            options={
+                'verbose_name': 'Место в очереди ожидания',
+                'verbose_name_plural': 'Очередь ожидания',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['course', 'created_at', 'id'], name='waitlist_course_order_idx')],
+                'unique_together': {('student', 'course')},
+            },
+        ),
+    ]
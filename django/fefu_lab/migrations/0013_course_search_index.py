@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:10
+
+import fefu_lab.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0012_waitlistentry'),
+    ]
+
+    operations = [
+        # Триггеры и однократное заполнение search_vector / FTS-таблицы
+        migrations.RunPython(fefu_lab.search.install_search_index, fefu_lab.search.remove_search_index),
+        # GIN строится по уже заполненной колонке
+        migrations.AddIndex(
+            model_name='course',
+            index=fefu_lab.search.SearchVectorIndex(fields=['search_vector'], name='course_search_vector_idx'),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Now
 from django.urls import reverse
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+from django.contrib.postgres.search import SearchVectorField
+from .search import SearchVectorIndex, search_courses
 from django.dispatch import receiver
 
 class Instructor(models.Model):
@@ -14,10 +18,14 @@ class Instructor(models.Model):
     degree = models.CharField(max_length=100, blank=True, verbose_name='Ученая степень')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     class Meta:
         verbose_name = 'Преподаватель'
         verbose_name_plural = 'Преподаватели'
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['is_active'], name='instructor_is_active_idx'),
+        ]
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
     @property
@@ -47,6 +55,15 @@ class Student(models.Model):
         null=True,  # Временно null для миграции
         blank=True
     )
+    # Связь преподавателя с его карточкой Instructor (курсы)
+    instructor = models.OneToOneField(
+        Instructor,
+        on_delete=models.SET_NULL,
+        related_name='student_profile',
+        verbose_name='Преподаватель',
+        null=True,
+        blank=True
+    )
     first_name = models.CharField(max_length=100, verbose_name='Имя')
     last_name = models.CharField(max_length=100, verbose_name='Фамилия')
     email = models.EmailField(unique=True, verbose_name='Email')
@@ -78,6 +95,12 @@ class Student(models.Model):
         verbose_name = 'Студент'
         verbose_name_plural = 'Студенты'
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['role', '-created_at'], name='student_role_created_idx'),
+            models.Index(fields=['is_active'], name='student_is_active_idx'),
+            # Keyset-пагинация API по ordering + id
+            models.Index(fields=['last_name', 'first_name', 'id'], name='student_name_id_idx'),
+        ]
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
     @property
@@ -93,6 +116,15 @@ class Student(models.Model):
         return self.role == 'ADMIN'
     def get_faculty_display_name(self):
         return dict(self.FACULTY_CHOICES).get(self.faculty, 'Неизвестно')
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_role = self.role
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженную роль для инкрементального дашборда
+        instance._loaded_role = instance.__dict__.get('role')
+        return instance
 
 # Сигнал для автоматического создания профиля при создании User
 @receiver(post_save, sender=User)
@@ -107,10 +139,55 @@ def create_student_profile(sender, instance, created, **kwargs):
             role='ADMIN' if (instance.is_staff or instance.is_superuser) else 'STUDENT'
         )
 
+# Поля User, которые дублируются в профиле студента
+PROFILE_MIRRORED_FIELDS = ('first_name', 'last_name', 'email')
+
 @receiver(post_save, sender=User)
-def save_student_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'student_profile'):
-        instance.student_profile.save()
+def save_student_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Пишем в профиль только изменившиеся поля; сохранения вроде
+    # обновления last_login при входе профиль не трогают вовсе
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(PROFILE_MIRRORED_FIELDS):
+        return
+    try:
+        student_profile = instance.student_profile
+    except Student.DoesNotExist:
+        return
+    changed = [
+        field for field in PROFILE_MIRRORED_FIELDS
+        if getattr(student_profile, field) != (getattr(instance, field) or '')
+    ]
+    if changed:
+        for field in changed:
+            setattr(student_profile, field, getattr(instance, field) or '')
+        student_profile.save(update_fields=changed + ['updated_at'])
+
+@receiver(post_save, sender=Instructor)
+def link_instructor_profile(sender, instance, raw=False, **kwargs):
+    # Как в миграции 0006: преподаватель, добавленный позже (например, в админке),
+    # связывается с профилем студента по email, иначе его дашборд пуст
+    if raw or Student.objects.filter(instructor=instance).exists():
+        return
+    student_pk = Student.objects.filter(
+        email=instance.email, instructor__isnull=True
+    ).order_by('pk').values_list('pk', flat=True).first()
+    if student_pk is not None:
+        Student.objects.filter(pk=student_pk).update(instructor=instance)
+
+class CourseQuerySet(models.QuerySet):
+    def with_enrollment_stats(self):
+        #Счетчики записей по статусам и свободные места одним запросом
+        return self.annotate(
+            active_count=Count('enrollments', filter=Q(enrollments__status='ACTIVE')),
+            completed_count=Count('enrollments', filter=Q(enrollments__status='COMPLETED')),
+            cancelled_count=Count('enrollments', filter=Q(enrollments__status='CANCELLED')),
+        ).annotate(
+            free_spots=F('max_students') - F('active_count')
+        )
+    def search(self, query):
+        #Полнотекстовый поиск с ранжированием (см. search.py)
+        return search_courses(self, query)
 
 class Course(models.Model):
     #Модель курса
@@ -138,6 +215,12 @@ class Course(models.Model):
         verbose_name='Уровень сложности'
     )
     max_students = models.IntegerField(default=30, verbose_name='Макс. студентов')
+    # Денормализованный счетчик активных записей, поддерживается сигналами Enrollment
+    active_enrollments = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Активных записей'
+    )
     price = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -146,14 +229,39 @@ class Course(models.Model):
     )
     is_active = models.BooleanField(default=True, verbose_name='Активен')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    # Обновляется и при изменении счетчика записей (см. _shift_active_enrollments)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    # Заполняется триггером PostgreSQL из title и description; на SQLite не используется
+    search_vector = SearchVectorField(null=True, editable=False)
+    objects = CourseQuerySet.as_manager()
     class Meta:
         verbose_name = 'Курс'
         verbose_name_plural = 'Курсы'
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['is_active', '-created_at'], name='course_active_created_idx'),
+            models.Index(fields=['-created_at'], name='course_created_idx'),
+            SearchVectorIndex(fields=['search_vector'], name='course_search_vector_idx'),
+        ]
     def __str__(self):
         return self.title
     def get_absolute_url(self):
         return reverse('course_detail', kwargs={'slug': self.slug})
+    @property
+    def available_spots(self):
+        return self.max_students - self.active_enrollments
+    @classmethod
+    def rebuild_active_enrollments(cls, queryset=None):
+        #Пересчитывает счетчик активных записей одним UPDATE
+        if queryset is None:
+            queryset = cls.objects.all()
+        active_count = Enrollment.objects.filter(
+            course=OuterRef('pk'),
+            status='ACTIVE'
+        ).order_by().values('course').annotate(total=Count('pk')).values('total')
+        return queryset.update(
+            active_enrollments=Coalesce(Subquery(active_count), Value(0))
+        )
 
 class Enrollment(models.Model):
     #Модель записи на курс
@@ -185,8 +293,114 @@ class Enrollment(models.Model):
         verbose_name = 'Запись на курс'
         verbose_name_plural = 'Записи на курсы'
         unique_together = ['student', 'course']  # Один студент не может записаться дважды
+        indexes = [
+            models.Index(fields=['student', 'status'], name='enroll_student_status_idx'),
+            models.Index(fields=['status', 'id'], name='enroll_status_id_idx'),
+            # Частичный индекс только по активным записям (Postgres, SQLite)
+            models.Index(
+                fields=['course'],
+                condition=Q(status='ACTIVE'),
+                name='enroll_course_active_idx'
+            ),
+        ]
     def __str__(self):
         return f"{self.student} → {self.course}"
+    def save(self, *args, **kwargs):
+        # Запись и счетчик курса меняются в одной транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        # Обработчики post_save уже отработали со старыми значениями
+        self._loaded_status = self.status
+        self._loaded_course_id = self.course_id
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженные значения для обновления счетчика курса
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_course_id = instance.__dict__.get('course_id')
+        return instance
+
+def _shift_active_enrollments(course_id, delta):
+    Course.objects.filter(pk=course_id).update(
+        active_enrollments=F('active_enrollments') + delta,
+        updated_at=Now()
+    )
+
+# Сигналы для поддержки Course.active_enrollments
+@receiver(post_save, sender=Enrollment)
+def update_active_enrollments_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created and not hasattr(instance, '_loaded_status'):
+        # Исходный статус неизвестен - пересчитываем курс целиком
+        Course.rebuild_active_enrollments(Course.objects.filter(pk=instance.course_id))
+    else:
+        old_course_id = None if created else instance._loaded_course_id
+        was_active = not created and instance._loaded_status == 'ACTIVE'
+        is_active = instance.status == 'ACTIVE'
+        moved = old_course_id != instance.course_id
+        if was_active and (not is_active or moved):
+            _shift_active_enrollments(old_course_id, -1)
+        # Место уже занято условным UPDATE счетчика (см. enrollment.reserve_seat)
+        seat_reserved = getattr(instance, '_seat_reserved', False)
+        if is_active and (not was_active or moved) and not seat_reserved:
+            _shift_active_enrollments(instance.course_id, 1)
+
+@receiver(post_delete, sender=Enrollment)
+def update_active_enrollments_on_delete(sender, instance, **kwargs):
+    status = getattr(instance, '_loaded_status', instance.status)
+    if status == 'ACTIVE':
+        course_id = getattr(instance, '_loaded_course_id', instance.course_id)
+        _shift_active_enrollments(course_id, -1)
+
+class WaitlistEntry(models.Model):
+    #Очередь ожидания на заполненный курс: места освобождаются по порядку постановки
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='Студент'
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='Курс'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')
+    class Meta:
+        verbose_name = 'Место в очереди ожидания'
+        verbose_name_plural = 'Очередь ожидания'
+        unique_together = ['student', 'course']
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['course', 'created_at', 'id'], name='waitlist_course_order_idx'),
+        ]
+    def __str__(self):
+        return f"{self.student} ⏳ {self.course}"
+
+class DashboardSnapshot(models.Model):
+    #Материализованные метрики админского дашборда
+    total_students = models.PositiveIntegerField(default=0, verbose_name='Студентов')
+    total_teachers = models.PositiveIntegerField(default=0, verbose_name='Преподавателей')
+    total_courses = models.PositiveIntegerField(default=0, verbose_name='Курсов')
+    total_enrollments = models.PositiveIntegerField(default=0, verbose_name='Записей')
+    active_enrollments = models.PositiveIntegerField(default=0, verbose_name='Активных записей')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата снимка')
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    class Meta:
+        verbose_name = 'Снимок дашборда'
+        verbose_name_plural = 'Снимки дашборда'
+        ordering = ['-created_at']
+        get_latest_by = 'created_at'
+        indexes = [
+            models.Index(fields=['-created_at'], name='snapshot_created_idx'),
+        ]
+    def __str__(self):
+        return f"Снимок от {self.created_at:%d.%m.%Y %H:%M}"
 
 class UserProfile(models.Model):
     username = models.CharField(max_length=50, unique=True)
@@ -0,0 +1,103 @@
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from .metrics import record_cache
+from .stats import get_versions, aget_versions, join_versions
+
+# Кэш целых страниц для анонимных посетителей.
+# Ключ включает версии моделей, от которых зависит страница (см. stats.py),
+# язык и полный путь; авторизованные пользователи всегда получают свежий ответ.
+
+PAGE_KEY = 'fefu_lab:page:{}:{}:{}'
+
+def page_cache_key(request, versions):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(join_versions(versions), translation.get_language(), path)
+
+async def aresolve_user(request):
+    #Загружает сессию и пользователя асинхронно и подменяет ленивый request.user,
+    #чтобы проверки и шаблоны не обращались к БД синхронно
+    request.user = await request.auser()
+    return request.user
+
+def is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Страница с непоказанными сообщениями (например, после выхода) уникальна
+    return not len(get_messages(request))
+
+def is_cacheable_response(response):
+    return response.status_code == 200 and not response.cookies and not response.streaming
+
+def cache_anonymous_page(*models, timeout=None):
+    #Отдает анонимным посетителям готовую страницу из кэша
+    def decorator(view_func):
+        def page_timeout():
+            return settings.FEFU_PAGE_CACHE_TIMEOUT if timeout is None else timeout
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                await aresolve_user(request)
+                if not is_cacheable_request(request):
+                    return await view_func(request, *args, **kwargs)
+                key = page_cache_key(request, await aget_versions(models))
+                response = await cache.aget(key)
+                record_cache('page', response is not None)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if is_cacheable_response(response):
+                        await cache.aset(key, response, page_timeout())
+                # Ответ зависит от сессии (анонимный или нет) и языка
+                patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+            key = page_cache_key(request, get_versions(models))
+            response = cache.get(key)
+            record_cache('page', response is not None)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if is_cacheable_response(response):
+                    cache.set(key, response, page_timeout())
+            # Ответ зависит от сессии (анонимный или нет) и языка
+            patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+            return response
+        return wrapper
+    return decorator
+
+async def afragment_version(*models):
+    #Версия для ключей {% cache %} фрагментов, зависящих от указанных моделей
+    return join_versions(await aget_versions(models))
+
+def make_etag(request, *parts):
+    #ETag страницы: данные строк + пользователь и язык (от них зависит шапка)
+    user_part = request.user.pk if request.user.is_authenticated else 'anonymous'
+    raw = '|'.join(str(part) for part in (user_part, translation.get_language(), *parts))
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+def not_modified(request, etag, last_modified=None):
+    #Ответ 304, если валидаторы клиента актуальны, иначе None
+    if len(get_messages(request)):
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
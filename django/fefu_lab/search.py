@@ -0,0 +1,177 @@
+import re
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+# Полнотекстовый поиск по курсам (title важнее description).
+# PostgreSQL: колонка search_vector (tsvector, русская морфология) заполняется
+# триггером и покрыта GIN-индексом. SQLite: FTS5-таблица с внешним содержимым,
+# синхронизируемая триггерами. Триггеры создаются и индекс заполняется один раз
+# миграцией 0013_course_search_index. SQLite пересоздает таблицу при ALTER и теряет
+# ее триггеры - их восстанавливает post_migrate (только если их нет).
+
+COURSE_TABLE = 'fefu_lab_course'
+FTS_TABLE = 'fefu_lab_course_fts'
+MAX_TERMS = 10
+
+POSTGRES_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION {COURSE_TABLE}_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"DROP TRIGGER IF EXISTS {COURSE_TABLE}_search_vector_update ON {COURSE_TABLE}",
+    f"""
+    CREATE TRIGGER {COURSE_TABLE}_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON {COURSE_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {COURSE_TABLE}_search_vector()
+    """,
+]
+POSTGRES_REBUILD_SQL = f"""
+    UPDATE {COURSE_TABLE} SET search_vector =
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+"""
+POSTGRES_REVERSE_SQL = [
+    f"DROP TRIGGER IF EXISTS {COURSE_TABLE}_search_vector_update ON {COURSE_TABLE}",
+    f"DROP FUNCTION IF EXISTS {COURSE_TABLE}_search_vector()",
+    f"UPDATE {COURSE_TABLE} SET search_vector = NULL",
+]
+
+SQLITE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='{COURSE_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {COURSE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {COURSE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, description ON {COURSE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+SQLITE_REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+SQLITE_REVERSE_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+def install_search_index(apps, schema_editor):
+    #RunPython миграции: триггеры и заполнение индекса для уже существующих курсов
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = [*POSTGRES_SQL, POSTGRES_REBUILD_SQL]
+    elif vendor == 'sqlite':
+        statements = [*SQLITE_SQL, SQLITE_REBUILD_SQL]
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql, None)
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_REVERSE_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_REVERSE_SQL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql, None)
+
+SQLITE_TRIGGERS = {f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_update'}
+
+def missing_sqlite_triggers(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [COURSE_TABLE])
+        return SQLITE_TRIGGERS - {row[0] for row in cursor.fetchall()}
+
+@receiver(post_migrate)
+def restore_sqlite_search_triggers(sender, using='default', **kwargs):
+    #Миграция Course на SQLite пересоздала таблицу: возвращаем триггеры и пересчитываем
+    #FTS-индекс, иначе поиск молча отстает от данных. Обычный migrate - один запрос
+    if sender.name != 'fefu_lab':
+        return
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return
+    if not missing_sqlite_triggers(connection):
+        return
+    with connection.cursor() as cursor:
+        for sql in [*SQLITE_SQL, SQLITE_REBUILD_SQL]:
+            cursor.execute(sql)
+
+class SearchVectorIndex(GinIndex):
+    #GIN есть только в PostgreSQL; на других СУБД search_vector всегда пустая (SQLite ищет
+    #через FTS5), и индекс не создается. Пустая строка, а не None: schema editor выполняет
+    #результат без проверки (в том числе при пересоздании таблицы в SQLite)
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+def fts_query(query):
+    #Запрос FTS5 из слов пользователя. Русской морфологии в FTS5 нет:
+    #у длинных слов отбрасываем окончание и ищем по префиксу
+    terms = []
+    for word in re.findall(r'\w+', query.lower())[:MAX_TERMS]:
+        stem = word[:-2] if len(word) >= 6 else word
+        terms.append(f'"{stem}"*')
+    return ' '.join(terms)
+
+def search_courses(queryset, query):
+    #Курсы, подходящие под запрос, с аннотацией rank (больше — релевантнее)
+    query = query.strip()
+    if not query:
+        return queryset.none()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config='russian', search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', 'title')
+    if connection.vendor == 'sqlite':
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        # Соединение с FTS-таблицей: отбор по ее индексу, ранг bm25 (вес title 10)
+        # считается за тот же проход. Для MATCH и bm25() в ORM нет выражений
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = "{COURSE_TABLE}"."id"', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'rank': f'-bm25({FTS_TABLE}, 10.0, 1.0)'},
+        ).order_by('-rank', 'title')
+    return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query)).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    ).order_by('title')
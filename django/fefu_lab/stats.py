@@ -0,0 +1,88 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .metrics import record_cache
+from .models import Student, Course, Instructor, Enrollment, WaitlistEntry
+
+# Кэш агрегатов для главной страницы.
+# Каждая модель имеет свою версию в кэше; ключ статистики собирается из версий,
+# поэтому изменение любой строки просто делает старый ключ недостижимым.
+
+VERSION_KEY = 'fefu_lab:version:{}'
+HOME_STATS_KEY = 'fefu_lab:home_stats:{}'
+HOME_STATS_MODELS = (Student, Course, Instructor)
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.model_name)
+
+def get_versions(models):
+    #Возвращает текущие версии моделей одним обращением к кэшу
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Версия вытеснена или еще не создана: начинаем с метки времени,
+            # чтобы не совпасть со старыми ключами
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+def bump_version(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+async def aget_versions(models):
+    #Асинхронный вариант get_versions
+    keys = [_version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+def join_versions(versions):
+    return '.'.join(str(version) for version in versions)
+
+async def aget_home_stats():
+    #Статистика и последние курсы для главной страницы
+    versions = await aget_versions(HOME_STATS_MODELS)
+    key = HOME_STATS_KEY.format(join_versions(versions))
+    stats = await cache.aget(key)
+    record_cache('home_stats', stats is not None)
+    if stats is None:
+        recent_courses = (
+            Course.objects.filter(is_active=True)
+            .select_related('instructor')
+            .order_by('-created_at')[:3]
+        )
+        stats = {
+            'stats_version': join_versions(versions),
+            'total_students': await Student.objects.filter(is_active=True).acount(),
+            'total_courses': await Course.objects.filter(is_active=True).acount(),
+            'total_instructors': await Instructor.objects.filter(is_active=True).acount(),
+            'recent_courses': [course async for course in recent_courses],
+        }
+        await cache.aset(key, stats, settings.FEFU_STATS_CACHE_TIMEOUT)
+    return stats
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=WaitlistEntry)
+@receiver(post_delete, sender=WaitlistEntry)
+def bump_model_version(sender, **kwargs):
+    # Сбрасываем версию только после коммита, иначе параллельный запрос
+    # может закэшировать еще не закоммиченные данные под новой версией
+    transaction.on_commit(lambda: bump_version(sender))
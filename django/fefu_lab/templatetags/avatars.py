@@ -0,0 +1,28 @@
+from django import template
+from django.utils.html import format_html
+from ..avatars import pick_size, variant_name
+
+register = template.Library()
+
+@register.simple_tag
+def avatar(student, size=128, css_class='avatar-img'):
+    #<picture> с WebP и JPEG миниатюрами подходящего размера (1x и 2x)
+    if not student.avatar:
+        return ''
+    alt = f'Аватар {student.full_name}'
+    name, storage = student.avatar.name, student.avatar.storage
+    base, retina = pick_size(size), pick_size(size * 2)
+    if not storage.exists(variant_name(name, base, 'jpg')):
+        # Миниатюры еще не построены (старая загрузка) - отдаем оригинал
+        return format_html('<img src="{}" alt="{}" class="{}">', student.avatar.url, alt, css_class)
+    def url(variant, extension):
+        return storage.url(variant_name(name, variant, extension))
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{} 1x, {} 2x">'
+        '<img src="{}" srcset="{} 1x, {} 2x" width="{}" height="{}" alt="{}" class="{}" loading="lazy">'
+        '</picture>',
+        url(base, 'webp'), url(retina, 'webp'),
+        url(base, 'jpg'), url(base, 'jpg'), url(retina, 'jpg'),
+        size, size, alt, css_class
+    )
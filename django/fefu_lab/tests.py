@@ -1,6 +1,40 @@
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from unittest import mock
+from django.test import RequestFactory, TestCase, TransactionTestCase
 from django.urls import reverse
-from django.http import Http404
+from django.http import Http404, HttpResponse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import tempfile
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, identify_hasher
+from django.contrib.auth.models import User
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from .models import Student, Course, Enrollment, Instructor, Feedback, WaitlistEntry
+from .dashboard import flush_deltas, get_latest_snapshot, refresh_snapshot
+from . import hashing, search, views
+from .avatars import AVATAR_SIZES, variant_name
+from .warmup import template_names, warm_up
+from .db_connections import measure_requests, reuses_connections
+from .timing import RequestTimingMiddleware
+from . import metrics
+from .feedback_buffer import FeedbackBuffer
+from . import enrollment
 
 
 class ViewTests(TestCase):
@@ -23,4 +57,1042 @@ class ViewTests(TestCase):
 
     def test_course_page_exists(self):
         response = self.client.get('/course/python-basic/')
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class CourseCounterTests(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='Курс',
+            duration=36, max_students=2
+        )
+        self.students = [
+            Student.objects.create(first_name=f'Имя{i}', last_name='Тест', email=f's{i}@fefu.ru')
+            for i in range(3)
+        ]
+
+    def active_enrollments(self):
+        self.course.refresh_from_db()
+        return self.course.active_enrollments
+
+    def test_counter_follows_create_status_change_and_delete(self):
+        first = Enrollment.objects.create(student=self.students[0], course=self.course)
+        Enrollment.objects.create(student=self.students[1], course=self.course, status='COMPLETED')
+        self.assertEqual(self.active_enrollments(), 1)
+        first.status = 'CANCELLED'
+        first.save()
+        self.assertEqual(self.active_enrollments(), 0)
+        enrollment = Enrollment.objects.get(pk=first.pk)
+        enrollment.status = 'ACTIVE'
+        enrollment.save()
+        self.assertEqual(self.active_enrollments(), 1)
+        enrollment.delete()
+        self.assertEqual(self.active_enrollments(), 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        Course.objects.update(active_enrollments=5)
+        call_command('rebuild_course_counters', stdout=StringIO())
+        self.assertEqual(self.active_enrollments(), 1)
+
+    def test_course_page_uses_counter(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        with self.assertNumQueries(1):
+            response = self.client.get('/course/python-basics/')
+        self.assertEqual(response.context['enrollments_count'], 1)
+        self.assertEqual(response.context['available_spots'], 1)
+
+
+class TeacherDashboardTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='i.petrov@fefu.ru', email='i.petrov@fefu.ru', password='teacher123'
+        )
+        self.client.force_login(self.user)
+        self.instructor = Instructor.objects.create(
+            first_name='Иван', last_name='Петров', email='i.petrov@fefu.ru',
+            specialization='Кибербезопасность'
+        )
+        Student.objects.filter(user=self.user).update(role='TEACHER', instructor=self.instructor)
+
+    def add_courses(self, count):
+        offset = self.instructor.courses.count()
+        for i in range(offset, offset + count):
+            Course.objects.create(
+                title=f'Курс {i}', slug=f'course-{i}', description='Курс',
+                duration=10, instructor=self.instructor
+            )
+
+    def test_query_count_does_not_depend_on_course_count(self):
+        self.add_courses(1)
+        with self.assertNumQueries(2):
+            self.client.get('/dashboard/teacher/')
+        self.add_courses(10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/dashboard/teacher/')
+        self.assertEqual(len(response.context['course_stats']), 11)
+
+    def test_stats_by_status(self):
+        self.add_courses(1)
+        course = self.instructor.courses.get()
+        for i, status in enumerate(['ACTIVE', 'ACTIVE', 'COMPLETED', 'CANCELLED']):
+            student = Student.objects.create(first_name=f'Имя{i}', last_name='Тест', email=f's{i}@fefu.ru')
+            Enrollment.objects.create(student=student, course=course, status=status)
+        stat = self.client.get('/dashboard/teacher/').context['course_stats'][0]
+        self.assertEqual(stat['enrollments_count'], 2)
+        self.assertEqual(stat['completed_count'], 1)
+        self.assertEqual(stat['cancelled_count'], 1)
+        self.assertEqual(stat['available_spots'], course.max_students - 2)
+
+
+    def test_instructor_added_later_is_linked_by_email(self):
+        user = User.objects.create_user(username='o.sidorova@fefu.ru', email='o.sidorova@fefu.ru')
+        Student.objects.filter(user=user).update(role='TEACHER')
+        instructor = Instructor.objects.create(
+            first_name='Ольга', last_name='Сидорова', email='o.sidorova@fefu.ru',
+            specialization='Программная инженерия'
+        )
+        Course.objects.create(title='Курс', slug='course', description='Курс', duration=10, instructor=instructor)
+        self.client.force_login(user)
+        response = self.client.get('/dashboard/teacher/')
+        self.assertEqual([stat['course'].slug for stat in response.context['course_stats']], ['course'])
+        instructor.save()
+        self.assertEqual(Student.objects.get(user=user).instructor, instructor)
+
+
+class HomeStatsCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_home_page_makes_no_queries(self):
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_saving_course_invalidates_stats(self):
+        self.assertEqual(self.client.get('/').context['total_courses'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(title='Курс', slug='course', description='Курс', duration=10)
+        response = self.client.get('/')
+        self.assertEqual(response.context['total_courses'], 1)
+        self.assertEqual([c.slug for c in response.context['recent_courses']], ['course'])
+
+
+class AuthenticatedRequestTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin@fefu.ru', email='admin@fefu.ru')
+        self.client.force_login(self.user)
+        Student.objects.filter(user=self.user).update(role='ADMIN')
+        refresh_snapshot()
+
+    def test_user_and_profile_loaded_together(self):
+        # Сессия читается из кэша, остается пользователь с профилем
+        with self.assertNumQueries(1):
+            self.client.get('/protected/')
+
+    def test_admin_dashboard_does_not_query_per_row(self):
+        for i in range(5):
+            Student.objects.create(first_name=f'Имя{i}', last_name='Тест', email=f's{i}@fefu.ru')
+            Course.objects.create(title=f'Курс {i}', slug=f'course-{i}', description='Курс', duration=10)
+        # Пользователь с профилем, снимок, студенты, курсы
+        with self.assertNumQueries(4):
+            response = self.client.get('/dashboard/admin/')
+        self.assertEqual(response.status_code, 200)
+
+
+class SessionCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_session_is_read_from_cache(self):
+        user = User.objects.create_user(username='anna@fefu.ru', email='anna@fefu.ru')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/protected/')
+        self.assertFalse([q for q in captured.captured_queries if 'django_session' in q['sql']])
+
+
+class DashboardSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(title='Курс', slug='course', description='Курс', duration=10)
+        self.student = Student.objects.create(first_name='Анна', last_name='Иванова', email='anna@fefu.ru')
+
+    def test_refresh_collects_all_metrics(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        Student.objects.create(first_name='Иван', last_name='Петров', email='ivan@fefu.ru', role='TEACHER')
+        snapshot = refresh_snapshot()
+        self.assertEqual(
+            (snapshot.total_students, snapshot.total_teachers, snapshot.total_courses,
+             snapshot.total_enrollments, snapshot.active_enrollments),
+            (1, 1, 1, 1, 1)
+        )
+
+    def test_signals_apply_deltas_to_latest_snapshot(self):
+        snapshot = refresh_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.status = 'COMPLETED'
+            enrollment.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.role = 'TEACHER'
+            self.student.save()
+        flush_deltas()
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.total_enrollments, 1)
+        self.assertEqual(snapshot.active_enrollments, 0)
+        self.assertEqual(snapshot.total_students, 0)
+        self.assertEqual(snapshot.total_teachers, 1)
+
+    @override_settings(FEFU_DASHBOARD_FLUSH_INTERVAL=3600)
+    def test_deltas_are_coalesced_into_one_update(self):
+        snapshot = refresh_snapshot()
+        flush_deltas()
+        with CaptureQueriesContext(connection) as captured:
+            for number in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    student = Student.objects.create(first_name='Иван', last_name='Петров',
+                                                     email=f'ivan{number}@fefu.ru')
+                    Enrollment.objects.create(student=student, course=self.course)
+        self.assertFalse([q for q in captured.captured_queries if 'dashboardsnapshot' in q['sql']])
+        # Последний снимок + один UPDATE на все дельты
+        with self.assertNumQueries(2):
+            flush_deltas()
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.total_students, snapshot.total_enrollments, snapshot.active_enrollments),
+                         (4, 3, 3))
+
+    def test_deltas_after_refresh_are_kept(self):
+        refresh_snapshot()
+        with override_settings(FEFU_DASHBOARD_FLUSH_INTERVAL=3600):
+            flush_deltas()
+            with self.captureOnCommitCallbacks(execute=True):
+                Enrollment.objects.create(student=self.student, course=self.course)
+            snapshot = refresh_snapshot()
+            with self.captureOnCommitCallbacks(execute=True):
+                Course.objects.create(title='Второй курс', slug='second', description='Курс', duration=10)
+        self.assertEqual(get_latest_snapshot().total_courses, 2)
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.total_courses, snapshot.total_enrollments), (2, 1))
+
+    def test_deltas_before_refresh_are_not_applied_twice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.student, course=self.course)
+        flush_deltas()
+        with override_settings(FEFU_DASHBOARD_FLUSH_INTERVAL=3600), self.captureOnCommitCallbacks(execute=True):
+            self.course.delete()
+        # Пересчет после дельты уже учитывает удаление курса
+        snapshot = refresh_snapshot()
+        flush_deltas()
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.total_courses, snapshot.total_enrollments), (0, 0))
+
+
+class QueryPlanTests(TestCase):
+
+    def setUp(self):
+        instructor = Instructor.objects.create(
+            first_name='Иван', last_name='Петров', email='i.petrov@fefu.ru',
+            specialization='Кибербезопасность'
+        )
+        course = Course.objects.create(
+            title='Курс', slug='course', description='Курс', duration=10, instructor=instructor
+        )
+        for username, role in [('student', 'STUDENT'), ('teacher', 'TEACHER'), ('admin', 'ADMIN')]:
+            user = User.objects.create_user(username=username, email=f'{username}@fefu.ru')
+            Student.objects.filter(user=user).update(
+                role=role, instructor=instructor if role == 'TEACHER' else None
+            )
+        Enrollment.objects.create(student=Student.objects.get(role='STUDENT'), course=course)
+
+    def test_view_queries_use_indexes(self):
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_keyset_page_seeks_index_at_cursor(self):
+        # Вторая страница студентов: курсор по (last_name, first_name, id)
+        next_url = self.client.get('/api/students/?limit=1').json()['next']
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(next_url)
+        sql = captured.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN ' + sql)
+                plan = ' '.join(row[0] for row in cursor.fetchall())
+                self.assertRegex(plan, r'Index Cond: .*last_name\)::text >=')
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+                # Один проход по индексу от курсора, без MULTI-INDEX OR и сортировки
+                self.assertEqual(len(plan), 1, plan)
+                self.assertIn('student_name_id_idx (last_name>?)', plan[0])
+
+
+class LoginLookupTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username='anna@fefu.ru', email='anna@fefu.ru', password='student123')
+
+    def test_login_resolves_user_with_single_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/login/', {'username': 'Anna@FEFU.ru', 'password': 'student123'})
+        self.assertRedirects(response, '/profile/', fetch_redirect_response=False)
+        lookups = [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "auth_user"' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+        self.assertIn('LOWER(', lookups[0])
+
+    def test_unknown_email_is_rejected(self):
+        response = self.client.post('/login/', {'username': 'nobody@fefu.ru', 'password': 'student123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+
+class AsyncAuthUrls:
+    urlpatterns = [
+        path('login/', views.async_login_view, name='login'),
+        path('register/', views.async_register_view, name='register'),
+        path('', include('fefu_lab.urls')),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncAuthUrls)
+class AsyncAuthTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username='anna@fefu.ru', email='anna@fefu.ru', password='student123')
+
+    async def test_async_login(self):
+        response = await self.async_client.post('/login/', {'username': 'anna@fefu.ru', 'password': 'student123'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/profile/')
+        session = await self.async_client.asession()
+        self.assertIn('_auth_user_id', await session.akeys())
+
+    async def test_login_upgrades_outdated_hash(self):
+        old_hash = PBKDF2PasswordHasher().encode('student123', 'oldsalt', iterations=1000)
+        await User.objects.filter(username='anna@fefu.ru').aupdate(password=old_hash)
+        response = await self.async_client.post('/login/', {'username': 'anna@fefu.ru', 'password': 'student123'})
+        self.assertEqual(response.status_code, 302)
+        user = await User.objects.aget(username='anna@fefu.ru')
+        self.assertNotEqual(user.password, old_hash)
+        self.assertEqual(identify_hasher(user.password).safe_summary(user.password)['iterations'],
+                         PBKDF2PasswordHasher.iterations)
+        self.assertTrue(user.check_password('student123'))
+
+    async def test_wrong_password_rerenders_form(self):
+        response = await self.async_client.post('/login/', {'username': 'anna@fefu.ru', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+
+    async def test_async_registration(self):
+        response = await self.async_client.post('/register/', {
+            'first_name': 'Иван', 'last_name': 'Петров', 'email': 'ivan@fefu.ru',
+            'password1': 'Sup3r-secret-pass', 'password2': 'Sup3r-secret-pass',
+        })
+        self.assertEqual(response.status_code, 302)
+        user = await User.objects.aget(username='ivan@fefu.ru')
+        self.assertTrue(user.check_password('Sup3r-secret-pass'))
+        self.assertEqual((await Student.objects.aget(user=user)).first_name, 'Иван')
+
+    async def test_saturated_pool_returns_503(self):
+        _, slots = hashing.get_pool()
+        taken = 0
+        while slots.acquire(blocking=False):
+            taken += 1
+        try:
+            response = await self.async_client.post('/login/', {'username': 'anna@fefu.ru', 'password': 'student123'})
+        finally:
+            for _ in range(taken):
+                slots.release()
+        self.assertEqual(response.status_code, 503)
+
+    async def test_cancelled_wait_keeps_slot_until_hashing_finishes(self):
+        _, slots = hashing.get_pool()
+
+        def free_slots():
+            free = 0
+            while slots.acquire(blocking=False):
+                free += 1
+            for _ in range(free):
+                slots.release()
+            return free
+        started, finish = threading.Event(), threading.Event()
+
+        def slow_hash():
+            started.set()
+            finish.wait(5)
+        before = free_slots()
+        task = asyncio.ensure_future(hashing.run_hashing(slow_hash))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        # Поток все еще хеширует - слот занят
+        self.assertEqual(free_slots(), before - 1)
+        finish.set()
+        for _ in range(100):
+            if free_slots() == before:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(free_slots(), before)
+
+
+class StudentProfileSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='anna@fefu.ru', email='anna@fefu.ru', password='student123', first_name='Анна'
+        )
+
+    def test_login_does_not_write_student_row(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/login/', {'username': 'anna@fefu.ru', 'password': 'student123'})
+        self.assertEqual(response.status_code, 302)
+        writes = [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith(('UPDATE', 'INSERT')) and 'fefu_lab_student' in query['sql']
+        ]
+        self.assertEqual(writes, [])
+
+    def test_changed_user_fields_are_mirrored(self):
+        self.user.email = 'anna.ivanova@fefu.ru'
+        with CaptureQueriesContext(connection) as captured:
+            self.user.save()
+        profile = Student.objects.get(user=self.user)
+        self.assertEqual(profile.email, 'anna.ivanova@fefu.ru')
+        self.assertEqual(profile.first_name, 'Анна')
+        update = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE "fefu_lab_student"')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('"bio"', update[0])
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(
+            title='Курс', slug='course', description='Курс', duration=10, max_students=5
+        )
+
+    def test_anonymous_course_page_served_from_cache(self):
+        self.client.get('/course/course/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/course/course/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_enrollment_invalidates_cached_page(self):
+        self.assertEqual(self.client.get('/course/course/').context['enrollments_count'], 0)
+        student = Student.objects.create(first_name='Анна', last_name='Иванова', email='anna@fefu.ru')
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=student, course=self.course)
+        self.assertEqual(self.client.get('/course/course/').context['enrollments_count'], 1)
+
+    def test_authenticated_user_bypasses_page_cache(self):
+        self.client.get('/course/course/')
+        user = User.objects.create_user(username='anna@fefu.ru', email='anna@fefu.ru')
+        self.client.force_login(user)
+        response = self.client.get('/course/course/')
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Личный кабинет')
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(title='Курс', slug='course', description='Курс', duration=10)
+        self.student = Student.objects.create(first_name='Анна', last_name='Иванова', email='anna@fefu.ru')
+        user = User.objects.create_user(username='ivan@fefu.ru', email='ivan@fefu.ru')
+        self.client.force_login(user)
+
+    def test_course_page_revalidates_with_304(self):
+        response = self.client.get('/course/course/')
+        self.assertTrue(response.has_header('Last-Modified'))
+        # Пользователь с профилем + строка курса; шаблон не рендерится
+        with self.assertNumQueries(2):
+            response = self.client.get('/course/course/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIsNone(response.context)
+
+    def test_enrollment_changes_course_etag(self):
+        etag = self.client.get('/course/course/')['ETag']
+        Enrollment.objects.create(student=self.student, course=self.course)
+        response = self.client.get('/course/course/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_student_page_etag_follows_enrollments(self):
+        url = f'/student/{self.student.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(url)['ETag']
+        enrollment.status = 'CANCELLED'
+        enrollment.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cached_anonymous_page_revalidates(self):
+        self.client.logout()
+        etag = self.client.get('/course/course/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/course/course/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class AsyncReadViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(title='Курс', slug='course', description='Курс', duration=10)
+        self.student = Student.objects.create(first_name='Анна', last_name='Иванова', email='anna@fefu.ru')
+        Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_read_views_are_async(self):
+        for view in (views.home_page, views.student_profile, views.CourseView.as_view()):
+            self.assertTrue(iscoroutinefunction(view))
+
+    async def test_async_client_renders_read_pages(self):
+        response = await self.async_client.get('/')
+        self.assertEqual(response.context['total_courses'], 1)
+        response = await self.async_client.get('/course/course/')
+        self.assertEqual(response.context['enrollments_count'], 1)
+        response = await self.async_client.get(f'/student/{self.student.pk}/')
+        self.assertEqual([e.course.slug for e in response.context['enrollments']], ['course'])
+
+    async def test_logged_in_user_resolved_without_sync_queries(self):
+        user = await User.objects.acreate_user(username='ivan@fefu.ru', email='ivan@fefu.ru')
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get('/course/course/')
+        self.assertContains(response, 'Личный кабинет')
+
+
+class WarmUpTests(TestCase):
+
+    def test_warm_up_compiles_all_fefu_lab_templates(self):
+        names = template_names()
+        self.assertIn('fefu_lab/base.html', names)
+        self.assertIn('fefu_lab/dashboard/admin_dashboard.html', names)
+        timings = warm_up(database=False)
+        self.assertEqual(set(timings), {'urls', 'templates'})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class ConnectionReuseTests(TransactionTestCase):
+
+    def setUp(self):
+        Course.objects.create(title='Курс', slug='course', description='Курс', duration=10)
+
+    def test_persistent_connection_reused_across_requests(self):
+        with mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}):
+            connection.close()
+            connection.ensure_connection()
+            raw = connection.connection
+            results = measure_requests(self.client, ['/', '/course/course/'], repeat=3)
+            self.assertTrue(reuses_connections())
+        self.assertEqual([status for _, status, _ in results], [200] * 6)
+        self.assertEqual(sum(opened for _, _, opened in results), 0)
+        self.assertIs(connection.connection, raw)
+
+    def test_warm_up_closes_connection_unless_kept(self):
+        with mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 60}):
+            connection.close()
+            self.assertIn('database', warm_up(keep_connection=False))
+            self.assertIsNone(connection.connection)
+            warm_up()
+            self.assertIsNotNone(connection.connection)
+
+
+class KeysetApiTests(TestCase):
+
+    def setUp(self):
+        for index, level in enumerate(['BEGINNER', 'ADVANCED', 'BEGINNER', 'BEGINNER', 'ADVANCED']):
+            Course.objects.create(title=f'Курс {index}', slug=f'course-{index}', description='Курс',
+                                  duration=10, level=level)
+        for index, faculty in enumerate(['CS', 'SE', 'CS']):
+            Student.objects.create(first_name='Анна', last_name='Иванова', email=f's{index}@fefu.ru',
+                                   faculty=faculty, phone='+7 900 000 00 00')
+
+    def collect(self, url):
+        results = []
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            results += data['results']
+            url = data['next']
+        return results
+
+    def test_cursor_walks_all_pages_in_ordering(self):
+        results = self.collect('/api/courses/?limit=2')
+        self.assertEqual([c['title'] for c in results], [f'Курс {index}' for index in range(5)])
+        results = self.collect('/api/courses/?limit=2&level=beginner')
+        self.assertEqual([c['slug'] for c in results], ['course-0', 'course-2', 'course-3'])
+
+    def test_students_tie_broken_by_id_and_public_fields_only(self):
+        results = self.collect('/api/students/?limit=1&faculty=CS')
+        self.assertEqual(len(results), 2)
+        self.assertLess(results[0]['id'], results[1]['id'])
+        self.assertEqual(set(results[0]), {'id', 'first_name', 'last_name', 'faculty'})
+
+    def test_enrollments_filtered_by_status(self):
+        course = Course.objects.get(slug='course-0')
+        for index, student in enumerate(Student.objects.order_by('id')):
+            Enrollment.objects.create(student=student, course=course,
+                                      status='ACTIVE' if index else 'CANCELLED')
+        results = self.collect('/api/enrollments/?limit=1&status=active')
+        self.assertEqual([e['status'] for e in results], ['ACTIVE', 'ACTIVE'])
+        self.assertEqual(results[0]['course__slug'], 'course-0')
+
+    def test_invalid_parameters_rejected(self):
+        self.assertEqual(self.client.get('/api/courses/?level=expert').status_code, 400)
+        self.assertEqual(self.client.get('/api/courses/?cursor=broken').status_code, 400)
+        # Корректный base64 и JSON, но значения не тех типов
+        for values in (['x'], [None], [[1]]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            self.assertEqual(self.client.get(f'/api/enrollments/?cursor={cursor}').status_code, 400)
+        cursor = base64.urlsafe_b64encode(json.dumps(['Курс 0', 'x']).encode()).decode()
+        self.assertEqual(self.client.get(f'/api/courses/?cursor={cursor}').status_code, 400)
+        self.assertEqual(self.client.get('/api/students/?limit=zero').status_code, 400)
+
+
+class CourseSearchTests(TestCase):
+
+    def setUp(self):
+        Course.objects.create(title='Программирование на Python', slug='python', duration=10,
+                              description='Основы языка и стандартная библиотека')
+        Course.objects.create(title='Базы данных', slug='databases', duration=10,
+                              description='SQL, индексы и программирование хранимых процедур')
+        Course.objects.create(title='Сети', slug='networks', duration=10, description='Маршрутизация')
+
+    def test_title_match_ranked_above_description_match(self):
+        results = self.client.get('/courses/search/?q=программированию').json()['results']
+        self.assertEqual([c['slug'] for c in results], ['python', 'databases'])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_index_follows_updates_and_deletes(self):
+        Course.objects.filter(slug='networks').update(description='Безопасность сетей и криптография')
+        self.assertEqual([c.slug for c in Course.objects.search('криптография')], ['networks'])
+        Course.objects.filter(slug='networks').delete()
+        self.assertFalse(Course.objects.search('криптография').exists())
+
+    def test_admin_search_uses_full_text_index(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@fefu.ru', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/fefu_lab/course/?q=маршрутизация')
+        self.assertEqual([c.slug for c in response.context['cl'].result_list], ['networks'])
+
+    def test_empty_query_rejected(self):
+        self.assertEqual(self.client.get('/courses/search/?q=').status_code, 400)
+
+    def test_gin_index_only_on_postgresql(self):
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, 'fefu_lab_course')
+        self.assertEqual('course_search_vector_idx' in indexes, connection.vendor == 'postgresql')
+
+    def test_triggers_restored_after_course_table_rebuild(self):
+        if connection.vendor != 'sqlite':
+            return
+        # Так выглядит таблица после ALTER в миграции SQLite: триггеров нет
+        with connection.cursor() as cursor:
+            for name in search.SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        Course.objects.create(title='Криптография', slug='crypto', duration=10, description='Шифры')
+        self.assertFalse(Course.objects.search('криптография').exists())
+        search.restore_sqlite_search_triggers(apps.get_app_config('fefu_lab'))
+        self.assertFalse(search.missing_sqlite_triggers(connection))
+        self.assertEqual([c.slug for c in Course.objects.search('криптография')], ['crypto'])
+
+
+class BulkSeedTests(TestCase):
+
+    def seed(self):
+        call_command('seed_data', students=30, courses=5, enrollments_per_student=2, seed=7,
+                     batch_size=8, clear=True, stdout=StringIO())
+        return list(Student.objects.order_by('email').values_list('email', 'last_name', 'faculty'))
+
+    def test_bulk_mode_is_consistent_and_deterministic(self):
+        first = self.seed()
+        self.assertEqual(Student.objects.filter(role='STUDENT').count(), 30)
+        self.assertEqual(Enrollment.objects.count(), 60)
+        self.assertEqual(len({password for password in User.objects.values_list('password', flat=True)}), 1)
+        self.assertTrue(User.objects.get(username='student0@seed7.fefu.ru').check_password('student123'))
+        for course in Course.objects.all():
+            self.assertEqual(course.active_enrollments, course.enrollments.filter(status='ACTIVE').count())
+        self.assertEqual(self.seed(), first)
+
+
+class BenchCommandTests(TestCase):
+
+    def run_bench(self, output, **options):
+        call_command('bench', students=10, courses=3, enrollments_per_student=1, iterations=2, warmup=0,
+                     output=output, stdout=StringIO(), **options)
+        with open(output, encoding='utf-8') as report:
+            return json.load(report)
+
+    def test_every_route_measured_and_compared_with_baseline(self):
+        directory = tempfile.mkdtemp()
+        report = self.run_bench(f'{directory}/baseline.json')
+        self.assertEqual(report['routes']['anonymous home']['status'], 200)
+        self.assertEqual(report['routes']['ADMIN admin_dashboard']['status'], 200)
+        self.assertIn('TEACHER teacher_dashboard', report['routes'])
+        # Базовый результат с меньшим числом запросов — рост считается регрессией
+        report['routes']['STUDENT profile']['queries'] -= 1
+        with open(f'{directory}/baseline.json', 'w', encoding='utf-8') as baseline:
+            json.dump(report, baseline)
+        with self.assertRaisesMessage(CommandError, 'STUDENT profile'):
+            self.run_bench(f'{directory}/current.json', baseline=f'{directory}/baseline.json')
+
+
+@override_settings(FEFU_TIMING_SAMPLE_RATE=1, FEFU_SLOW_REQUEST_MS=0, FEFU_DUPLICATE_QUERY_THRESHOLD=3)
+class RequestTimingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('about'))
+        timings = dict(part.split(';', 1)[0:2] for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'tpl', 'view', 'total'})
+
+    def test_template_time_counted(self):
+        response = self.client.get(reverse('about'))
+        template = response['Server-Timing'].split(', ')[1]
+        self.assertGreater(float(template.split('dur=')[1]), 0)
+
+    @override_settings(FEFU_TIMING_SAMPLE_RATE=0, FEFU_SLOW_REQUEST_MS=100000)
+    def test_unsampled_request_has_no_header(self):
+        response = self.client.get(reverse('about'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_repeated_queries_logged(self):
+        def n_plus_one(request):
+            for pk in range(4):
+                Course.objects.filter(pk=pk).exists()
+            return HttpResponse()
+        middleware = RequestTimingMiddleware(n_plus_one)
+        with self.assertLogs('fefu_lab.timing', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/n-plus-one/'))
+        self.assertIn('4 queries', response['Server-Timing'])
+        self.assertIn('4x SELECT', logs.output[0])
+
+    async def test_async_get_response_stays_async(self):
+        async def view(request):
+            await Course.objects.acount()
+            return HttpResponse()
+        middleware = RequestTimingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/async/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    @override_settings(FEFU_SLOW_REQUEST_MS=0.001)
+    def test_slow_request_logged_with_queries(self):
+        def slow(request):
+            Course.objects.count()
+            return HttpResponse()
+        with self.assertLogs('fefu_lab.timing', 'WARNING') as logs:
+            RequestTimingMiddleware(slow)(RequestFactory().get('/slow/'))
+        self.assertIn('Медленный запрос GET /slow/', logs.output[0])
+        self.assertIn('COUNT(*)', logs.output[0])
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def sample(self, name, **labels):
+        metrics.flush()
+        return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_by_route_name(self):
+        labels = {'route': 'about', 'method': 'GET', 'status': '2xx'}
+        before = self.sample('fefu_http_request_duration_seconds_count', **labels)
+        self.client.get(reverse('about'))
+        self.assertEqual(self.sample('fefu_http_request_duration_seconds_count', **labels), before + 1)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'fefu_http_request_duration_seconds_bucket{le="0.005",method="GET",route="about"',
+                      response.content)
+
+    async def test_async_get_response_stays_async(self):
+        async def view(request):
+            await Course.objects.acount()
+            return HttpResponse()
+        middleware = metrics.MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        queries = self.sample('fefu_db_queries_total', route='unmatched')
+        await middleware(RequestFactory().get('/async/'))
+        self.assertEqual(self.sample('fefu_db_queries_total', route='unmatched'), queries + 1)
+
+    @override_settings(FEFU_METRICS_MAX_PENDING=3)
+    def test_backlog_is_flushed_inline(self):
+        metrics.flush()
+        before = metrics.REGISTRY.get_sample_value('fefu_logins_total', {'result': 'failure'}) or 0
+        for _ in range(3):
+            metrics.record(metrics.LOGINS, ('failure',))
+        self.assertFalse(metrics._pending)
+        self.assertEqual(metrics.REGISTRY.get_sample_value('fefu_logins_total', {'result': 'failure'}), before + 3)
+
+    def test_page_cache_hits_and_misses(self):
+        misses = self.sample('fefu_cache_requests_total', cache='page', result='miss')
+        hits = self.sample('fefu_cache_requests_total', cache='page', result='hit')
+        self.client.get(reverse('about'))
+        self.client.get(reverse('about'))
+        self.assertEqual(self.sample('fefu_cache_requests_total', cache='page', result='miss'), misses + 1)
+        self.assertEqual(self.sample('fefu_cache_requests_total', cache='page', result='hit'), hits + 1)
+
+    def test_login_success_and_failure(self):
+        User.objects.create_user(username='metrics@fefu.ru', email='metrics@fefu.ru', password='pass12345')
+        failures = self.sample('fefu_logins_total', result='failure')
+        successes = self.sample('fefu_logins_total', result='success')
+        self.client.post(reverse('login'), {'username': 'metrics@fefu.ru', 'password': 'wrong'})
+        self.client.post(reverse('login'), {'username': 'nobody@fefu.ru', 'password': 'pass12345'})
+        self.client.post(reverse('login'), {'username': 'metrics@fefu.ru', 'password': 'pass12345'})
+        self.assertEqual(self.sample('fefu_logins_total', result='failure'), failures + 2)
+        self.assertEqual(self.sample('fefu_logins_total', result='success'), successes + 1)
+
+    @override_settings(ROOT_URLCONF=AsyncAuthUrls)
+    async def test_async_login_failures(self):
+        await sync_to_async(User.objects.create_user)(
+            username='metrics@fefu.ru', email='metrics@fefu.ru', password='pass12345'
+        )
+        failures = self.sample('fefu_logins_total', result='failure')
+        await self.async_client.post(reverse('login'), {'username': 'metrics@fefu.ru', 'password': 'wrong'})
+        await self.async_client.post(reverse('login'), {'username': 'nobody@fefu.ru', 'password': 'pass12345'})
+        self.assertEqual(self.sample('fefu_logins_total', result='failure'), failures + 2)
+
+    def test_workers_aggregated_in_multiprocess_mode(self):
+        directory = tempfile.mkdtemp()
+        env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+        worker = ('import django; django.setup(); from fefu_lab import metrics; '
+                  'metrics.record(metrics.LOGINS, ("failure",)); metrics.flush()')
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', worker], env=env, check=True,
+                           cwd=os.path.dirname(os.path.dirname(__file__)))
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            response = self.client.get('/metrics')
+        self.assertIn(b'fefu_logins_total{result="failure"} 2.0', response.content)
+
+
+class FeedbackBufferTests(TransactionTestCase):
+
+    def feedback(self, number):
+        return Feedback(name='Спамер', email=f'spam{number}@example.com', subject=f'Тема {number}', message='...')
+
+    def submit_from_threads(self, buffer, numbers):
+        threads = [threading.Thread(target=lambda chunk=chunk: [buffer.submit(self.feedback(n)) for n in chunk])
+                   for chunk in (numbers[0::4], numbers[1::4], numbers[2::4], numbers[3::4])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_batches_written_in_background(self):
+        buffer = FeedbackBuffer(max_size=1000, batch_size=10, flush_ms=20)
+        with CaptureQueriesContext(connection) as captured:
+            for number in range(25):
+                self.assertTrue(buffer.submit(self.feedback(number)))
+        # В потоке запроса INSERT нет
+        self.assertEqual(len(captured.captured_queries), 0)
+        deadline = time.monotonic() + 5
+        while Feedback.objects.count() < 25 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(Feedback.objects.count(), 25)
+        buffer.stop()
+
+    def test_nothing_lost_across_graceful_restart(self):
+        # Интервал больше времени теста: все, что не набрало пачку, дописывает stop()
+        first = FeedbackBuffer(max_size=1000, batch_size=50, flush_ms=60000)
+        self.submit_from_threads(first, list(range(0, 130)))
+        first.stop()
+        self.assertFalse(first.thread.is_alive())
+        # После остановки отзыв сохраняется сразу
+        self.assertFalse(first.submit(self.feedback(130)))
+        restarted = FeedbackBuffer(max_size=1000, batch_size=50, flush_ms=60000)
+        self.submit_from_threads(restarted, list(range(131, 200)))
+        restarted.stop()
+        self.assertEqual(
+            sorted(Feedback.objects.values_list('email', flat=True)),
+            sorted(f'spam{number}@example.com' for number in range(200)),
+        )
+
+    def test_full_queue_falls_back_to_synchronous_write(self):
+        buffer = FeedbackBuffer(max_size=2, batch_size=10, flush_ms=60000)
+        with mock.patch.object(buffer, 'ensure_started'):
+            results = [buffer.submit(self.feedback(number)) for number in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(Feedback.objects.count(), 1)
+        buffer.stop()
+        self.assertEqual(Feedback.objects.count(), 3)
+
+    @override_settings(FEFU_FEEDBACK_BUFFER_SIZE=0)
+    def test_view_writes_synchronously_when_disabled(self):
+        response = self.client.post(reverse('feedback'), {
+            'name': 'Иван', 'email': 'ivan@example.com', 'subject': 'Вопрос по курсу', 'message': 'Когда начало курса?',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Feedback.objects.filter(email='ivan@example.com').exists())
+
+
+class EnrollmentStressTests(TransactionTestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(title='Популярный курс', slug='popular', description='...',
+                                            duration=10, max_students=5)
+        self.students = [
+            Student.objects.create(first_name=f'Студент{number}', last_name='Тестов',
+                                   email=f'stress{number}@fefu.ru', faculty='CS')
+            for number in range(40)
+        ]
+
+    def run_concurrently(self, calls):
+        #Все вызовы стартуют одновременно, каждый в своем потоке со своим соединением
+        barrier = threading.Barrier(len(calls))
+        results, errors = [], []
+
+        def worker(call):
+            try:
+                barrier.wait()
+                results.append(call())
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=worker, args=(call,)) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def assert_not_overbooked(self):
+        self.course.refresh_from_db()
+        active = Enrollment.objects.filter(course=self.course, status='ACTIVE').count()
+        self.assertEqual(self.course.active_enrollments, active)
+        self.assertLessEqual(active, self.course.max_students)
+        return active
+
+    def test_course_never_overbooked(self):
+        results = self.run_concurrently([
+            lambda student=student: enrollment.enroll(student, self.course) for student in self.students
+        ])
+        self.assertEqual(results.count(enrollment.ENROLLED), 5)
+        self.assertEqual(results.count(enrollment.WAITLISTED), 35)
+        self.assertEqual(self.assert_not_overbooked(), 5)
+        self.assertEqual(WaitlistEntry.objects.filter(course=self.course).count(), 35)
+
+    def test_same_student_enrolled_once(self):
+        student = self.students[0]
+        results = self.run_concurrently([lambda: enrollment.enroll(student, self.course)] * 10)
+        self.assertEqual(results.count(enrollment.ENROLLED), 1)
+        self.assertEqual(Enrollment.objects.filter(student=student, course=self.course).count(), 1)
+        self.assertEqual(self.assert_not_overbooked(), 1)
+
+    def test_freed_seats_go_to_waitlist_in_order(self):
+        for student in self.students[:8]:
+            enrollment.enroll(student, self.course)
+        waitlisted = self.students[5:8]
+        newcomers = self.students[8:20]
+        # Двое отписываются одновременно с наплывом новых студентов
+        self.run_concurrently(
+            [lambda student=student: enrollment.unenroll(student, self.course) for student in self.students[:2]]
+            + [lambda student=student: enrollment.enroll(student, self.course) for student in newcomers]
+        )
+        self.assertEqual(self.assert_not_overbooked(), 5)
+        active = set(Enrollment.objects.filter(course=self.course, status='ACTIVE').values_list('student_id', flat=True))
+        # Места получили первые в очереди, новые студенты ее не обогнали
+        self.assertEqual(active, {student.pk for student in self.students[2:7]})
+        queue = list(WaitlistEntry.objects.filter(course=self.course).values_list('student_id', flat=True))
+        self.assertEqual(queue[0], waitlisted[2].pk)
+        self.assertEqual(set(queue[1:]), {student.pk for student in newcomers})
+
+    def test_reenroll_after_cancel_reuses_row(self):
+        student = self.students[0]
+        self.assertEqual(enrollment.enroll(student, self.course), enrollment.ENROLLED)
+        self.assertEqual(enrollment.unenroll(student, self.course), enrollment.CANCELLED)
+        self.assertEqual(enrollment.enroll(student, self.course), enrollment.ENROLLED)
+        self.assertEqual(Enrollment.objects.get(student=student, course=self.course).status, 'ACTIVE')
+        self.assertEqual(self.assert_not_overbooked(), 1)
+
+    def test_enroll_and_unenroll_views(self):
+        user = User.objects.create_user(username='enroll@fefu.ru', email='enroll@fefu.ru')
+        self.client.force_login(user)
+        Course.objects.filter(pk=self.course.pk).update(max_students=0)
+        response = self.client.post(reverse('course_enroll', kwargs={'course_slug': 'popular'}), follow=True)
+        self.assertContains(response, 'Вы в очереди ожидания: место 1')
+        self.assertEqual(self.client.get(reverse('course_enroll', kwargs={'course_slug': 'popular'})).status_code, 405)
+        Course.objects.filter(pk=self.course.pk).update(max_students=1)
+        response = self.client.post(reverse('course_unenroll', kwargs={'course_slug': 'popular'}), follow=True)
+        self.assertContains(response, 'Вы вышли из очереди ожидания')
+        response = self.client.post(reverse('course_enroll', kwargs={'course_slug': 'popular'}), follow=True)
+        self.assertContains(response, 'Вы записаны на курс')
+        self.assertContains(response, 'Отменить запись')
+        self.assertEqual(self.assert_not_overbooked(), 1)
+
+    def test_course_page_etag_follows_waitlist_position(self):
+        user = User.objects.create_user(username='queue@fefu.ru', email='queue@fefu.ru')
+        self.client.force_login(user)
+        Course.objects.filter(pk=self.course.pk).update(max_students=0)
+        self.course.refresh_from_db()
+        enrollment.enroll(self.students[0], self.course)
+        enrollment.enroll(user.student_profile, self.course)
+        url = reverse('course_detail', kwargs={'course_slug': 'popular'})
+        response = self.client.get(url)
+        self.assertContains(response, 'место 2')
+        validators = {'HTTP_IF_NONE_MATCH': response['ETag'], 'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}
+        self.assertEqual(self.client.get(url, **validators).status_code, 304)
+        # Строка курса не меняется, меняется только очередь
+        enrollment.unenroll(self.students[0], self.course)
+        response = self.client.get(url, **validators)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'место 1')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarPipelineTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='anna@fefu.ru', email='anna@fefu.ru', first_name='Анна')
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='photo.png'):
+        return self.client.post('/profile/edit/', {
+            'first_name': 'Анна', 'last_name': 'Иванова', 'email': 'anna@fefu.ru',
+            'faculty': 'CS', 'avatar': SimpleUploadedFile(name, content),
+        })
+
+    def test_variants_are_generated_without_metadata(self):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGBA', (600, 400), (200, 10, 10, 255)).save(buffer, 'PNG', exif=exif)
+        response = self.upload(buffer.getvalue())
+        self.assertRedirects(response, '/profile/', fetch_redirect_response=False)
+        avatar = Student.objects.get(user=self.user).avatar
+        with avatar.storage.open(avatar.name) as original:
+            image = Image.open(original)
+            self.assertEqual((image.format, image.size), ('PNG', (600, 400)))
+            self.assertFalse(image.getexif())
+        for size in AVATAR_SIZES:
+            for extension in ('webp', 'jpg'):
+                with avatar.storage.open(variant_name(avatar.name, size, extension)) as variant:
+                    image = Image.open(variant)
+                    self.assertEqual(image.size, (size, size))
+                    self.assertFalse(image.getexif())
+        self.assertContains(self.client.get('/profile/'), '_128.webp')
+
+    def test_non_image_is_rejected(self):
+        response = self.upload(b'not an image', name='photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['avatar'])
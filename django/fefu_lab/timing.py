@@ -0,0 +1,161 @@
+import logging
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+# Замер запросов: число SQL-запросов и время БД, время рендеринга шаблонов и view,
+# повторяющиеся запросы (N+1). Результат уходит в заголовок Server-Timing,
+# медленные запросы пишутся в лог fefu_lab.timing вместе с самыми долгими SQL.
+# Подробно замеряется только доля FEFU_TIMING_SAMPLE_RATE запросов.
+
+logger = logging.getLogger('fefu_lab.timing')
+
+_current = ContextVar('fefu_lab_request_timing', default=None)
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = []
+        self.template_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        #execute_wrapper: время каждого SQL-запроса
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+    @property
+    def db_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        #Одинаковый SQL (с разными параметрами), выполненный несколько раз за запрос
+        threshold = settings.FEFU_DUPLICATE_QUERY_THRESHOLD
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+    def slowest(self, limit=3):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_ms += (time.perf_counter() - started) * 1000
+
+class TimedDjangoTemplates(DjangoTemplates):
+    #Бэкенд шаблонов Django, который учитывает время рендеринга в замере запроса
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+def record_query(execute, sql, params, many, context):
+    #execute_wrapper каждого соединения: пишет SQL в замер текущего запроса, если он идет.
+    #Замер берется из ContextVar, который asgiref переносит и в потоки sync_to_async:
+    #соединения привязаны к потоку, поэтому обернуть их из event loop нельзя
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+@receiver(connection_created)
+def install_query_timing(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        # В начало списка: connection.execute_wrapper() снимает свою обертку pop()
+        connection.execute_wrappers.insert(0, record_query)
+
+@contextmanager
+def measure(timing):
+    token = _current.set(timing)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+class RequestTimingMiddleware:
+    # Под ASGI не переводит асинхронные view в поток
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.FEFU_TIMING_SAMPLE_RATE <= 0 and settings.FEFU_SLOW_REQUEST_MS <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timing = self.sample()
+        if timing is None:
+            response = self.get_response(request)
+        else:
+            with measure(timing):
+                response = self.get_response(request)
+        return self.finish(request, response, started, timing)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timing = self.sample()
+        if timing is None:
+            response = await self.get_response(request)
+        else:
+            with measure(timing):
+                response = await self.get_response(request)
+        return self.finish(request, response, started, timing)
+
+    def sample(self):
+        # Без выборки меряем только общее время для лога медленных запросов
+        if random.random() >= settings.FEFU_TIMING_SAMPLE_RATE:
+            return None
+        return RequestTiming()
+
+    def finish(self, request, response, started, timing):
+        total_ms = (time.perf_counter() - started) * 1000
+        if timing is None:
+            self.log_slow(request, response, total_ms)
+            return response
+        view_ms = max(total_ms - timing.db_ms - timing.template_ms, 0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_ms:.1f};desc="{len(timing.queries)} queries"',
+            f'tpl;dur={timing.template_ms:.1f}',
+            f'view;dur={view_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+        duplicates = timing.duplicates()
+        if duplicates:
+            logger.warning('Повторяющиеся запросы в %s %s: %s', request.method, request.path,
+                           '; '.join(f'{count}x {sql[:200]}' for sql, count in duplicates))
+        self.log_slow(request, response, total_ms, timing)
+        return response
+
+    def log_slow(self, request, response, total_ms, timing=None):
+        if settings.FEFU_SLOW_REQUEST_MS <= 0 or total_ms < settings.FEFU_SLOW_REQUEST_MS:
+            return
+        message = f'Медленный запрос {request.method} {request.path} [{response.status_code}] {total_ms:.1f} ms'
+        if timing is not None:
+            message += (f', SQL: {len(timing.queries)} запросов / {timing.db_ms:.1f} ms, '
+                        f'шаблоны: {timing.template_ms:.1f} ms')
+            for sql, duration in timing.slowest():
+                message += f'\n    {duration:.1f} ms: {sql[:500]}'
+        logger.warning(message)
@@ -1,15 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, api
 from django.contrib.auth import views as auth_views
 
+# Под ASGI (FEFU_ASYNC_AUTH) вход и регистрация - асинхронные view
+if settings.FEFU_ASYNC_AUTH:
+    register_view, login_view = views.async_register_view, views.async_login_view
+else:
+    register_view, login_view = views.register_view, views.login_view
+
 urlpatterns = [
     path('', views.home_page, name='home'),
     path('about/', views.about_page, name='about'),
     path('student/<int:student_id>/', views.student_profile, name='student_profile'),
+    path('courses/search/', api.course_search, name='course_search'),
     path('course/<slug:course_slug>/', views.CourseView.as_view(), name='course_detail'),
+    path('course/<slug:course_slug>/enroll/', views.course_enroll_view, name='course_enroll'),
+    path('course/<slug:course_slug>/unenroll/', views.course_unenroll_view, name='course_unenroll'),
     path('feedback/', views.feedback_view, name='feedback'),
-    path('register/', views.register_view, name='register'),
-    path('login/', views.login_view, name='login'),
+    path('register/', register_view, name='register'),
+    path('login/', login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.profile_edit_view, name='profile_edit'),
@@ -18,6 +28,9 @@ urlpatterns = [
     path('dashboard/admin/', views.admin_dashboard_view, name='admin_dashboard'),
     path('protected/', views.protected_page_view, name='protected_page'),
     path('staff-only/', views.staff_only_view, name='staff_only'),
+    path('api/courses/', api.course_list, name='api_course_list'),
+    path('api/students/', api.student_list, name='api_student_list'),
+    path('api/enrollments/', api.enrollment_list, name='api_enrollment_list'),
     path('password-reset/',
          auth_views.PasswordResetView.as_view(
              template_name='fefu_lab/registration/password_reset.html'
@@ -1,52 +1,74 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.http import HttpResponse, Http404
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import require_POST
+from django.db.models import Count, Max, Q, Sum
 from .forms import FeedbackForm, RegistrationForm, LoginForm
-from .models import UserProfile, Feedback, Student, Course, Instructor, Enrollment
-from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
+from .models import UserProfile, Feedback, Student, Course, Instructor, Enrollment, WaitlistEntry
+from .stats import aget_home_stats, aget_versions, join_versions
+from .page_cache import cache_anonymous_page, afragment_version, make_etag, not_modified, set_validators
+from .dashboard import get_latest_snapshot
+from .backends import get_user_by_login
+from .hashing import HashingPoolSaturated, acheck_password, amake_password
+from .feedback_buffer import submit_feedback
+from . import enrollment as course_enrollment
+from django.contrib.auth import login, alogin, logout, authenticate, update_session_auth_hash
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.signals import user_login_failed
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
 from .forms import (
     CustomUserCreationForm,
     CustomAuthenticationForm,
+    AsyncAuthenticationForm,
     ProfileUpdateForm,
     PasswordChangeCustomForm
 )
 
-def home_page(request):
-    # Статистика для главной страницы
-    total_students = Student.objects.filter(is_active=True).count()
-    total_courses = Course.objects.filter(is_active=True).count()
-    total_instructors = Instructor.objects.filter(is_active=True).count()
-    # Последние добавленные курсы
-    recent_courses = Course.objects.filter(is_active=True).order_by('-created_at')[:3]
-    context = {
-        'total_students': total_students,
-        'total_courses': total_courses,
-        'total_instructors': total_instructors,
-        'recent_courses': recent_courses,
-    }
-    return render(request, 'fefu_lab/home.html', context)
+@cache_anonymous_page(Student, Course, Instructor)
+async def home_page(request):
+    # Статистика для главной страницы берется из версионированного кэша
+    context = await aget_home_stats()
+    return await sync_to_async(render)(request, 'fefu_lab/home.html', context)
 
+@cache_anonymous_page()
 def about_page(request):
     return render(request, 'fefu_lab/about.html')
 
-def student_profile(request, student_id):
-    try:
-        student = Student.objects.get(id=student_id, is_active=True)
-        enrollments = student.enrollments.filter(status='ACTIVE').select_related('course')
-        context = {
-            'student': student,
-            'enrollments': enrollments,
-            'student_id': student.id,
-            'student_name': student.full_name,
-            'faculty': student.get_faculty_display_name(),
-            'status': 'Активен' if student.is_active else 'Неактивен',
-        }
-        return render(request, 'fefu_lab/student_profile.html', context)
-    except Student.DoesNotExist:
+@cache_anonymous_page(Student, Course, Enrollment)
+async def student_profile(request, student_id):
+    # Одним запросом берем студента и отпечаток его активных записей для ETag
+    active = Q(enrollments__status='ACTIVE')
+    student = await Student.objects.select_related('user').annotate(
+        active_count=Count('enrollments', filter=active),
+        active_ids=Sum('enrollments__pk', filter=active),
+        courses_updated=Max('enrollments__course__updated_at', filter=active),
+    ).filter(id=student_id, is_active=True).afirst()
+    if student is None:
         raise Http404("Студент не найден")
+    etag = make_etag(request, student.pk, student.updated_at.isoformat(),
+                     student.active_count, student.active_ids, student.courses_updated)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    enrollments = [
+        enrollment async for enrollment in
+        student.enrollments.filter(status='ACTIVE').select_related('course')
+    ]
+    context = {
+        'student': student,
+        'enrollments': enrollments,
+        'student_id': student.id,
+        'student_name': student.full_name,
+        'faculty': student.get_faculty_display_name(),
+        'status': 'Активен' if student.is_active else 'Неактивен',
+    }
+    response = await sync_to_async(render)(request, 'fefu_lab/student_profile.html', context)
+    return set_validators(response, etag)
 
 def student_profile_context(request):
     #Добавляет student_profile в контекст если пользователь авторизован
@@ -57,15 +79,43 @@ def student_profile_context(request):
             return {}
     return {}
 
+@method_decorator(cache_anonymous_page(Course, Instructor, Enrollment), name='get')
 class CourseView(View):
-    def get(self, request, course_slug):
+    async def get(self, request, course_slug):
         try:
-            course = Course.objects.get(slug=course_slug, is_active=True)
-            enrollments_count = course.enrollments.filter(status='ACTIVE').count()
-            available_spots = course.max_students - enrollments_count
+            course = await Course.objects.select_related('instructor').aget(slug=course_slug, is_active=True)
+            # Валидаторы из меток времени строк и счетчика записей: 304 без рендеринга
+            last_modified = max(
+                course.updated_at,
+                course.instructor.updated_at if course.instructor else course.updated_at
+            )
+            etag_parts = [course.pk, course.updated_at.isoformat(), course.instructor_id,
+                          last_modified.isoformat(), course.active_enrollments]
+            # Кнопки записи зависят от студента, поэтому они вне кэшируемого фрагмента
+            is_student = get_role(request.user) == 'STUDENT'
+            if is_student:
+                # Статус студента и место в очереди меняются без изменения строки курса
+                # (кто-то впереди вышел из очереди). Версии моделей в кэше (см. stats.py)
+                # меняются при любой записи на курс или в очередь, запросов к БД не нужно
+                etag_parts.append(join_versions(await aget_versions((Enrollment, WaitlistEntry))))
+            # Браузер присылает If-None-Match вместе с If-Modified-Since, и тогда дата не
+            # учитывается: изменения очереди проверяются по ETag
+            etag = make_etag(request, *etag_parts)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            # Счетчик поддерживается сигналами Enrollment, COUNT не нужен
+            enrollments_count = course.active_enrollments
+            available_spots = course.available_spots
+            enrollment_status = waitlist_position = None
+            if is_student:
+                enrollment_status, waitlist_position = await course_enrollment.aget_enrollment_state(
+                    request.user.student_profile.pk, course
+                )
             context = {
                 'course': course,
                 'course_slug': course.slug,
+                'fragment_version': await afragment_version(Course, Instructor, Enrollment),
                 'enrollments_count': enrollments_count,
                 'available_spots': available_spots,
                 'title': course.title,
@@ -74,11 +124,25 @@ class CourseView(View):
                 'instructor': course.instructor.full_name if course.instructor else 'Не назначен',
                 'level': course.get_level_display(),
                 'price': course.price,
+                'is_student': is_student,
+                'enrollment_status': enrollment_status,
+                'waitlist_position': waitlist_position,
             }
-            return render(request, 'fefu_lab/course_detail.html', context)
+            response = await sync_to_async(render)(request, 'fefu_lab/course_detail.html', context)
+            return set_validators(response, etag, last_modified)
         except Course.DoesNotExist:
             raise Http404("Курс не найден")
 
+def save_registration(form):
+    #Создает пользователя и заполняет его профиль студента
+    user = form.save()
+    student_profile = Student.objects.get(user=user)
+    student_profile.first_name = form.cleaned_data['first_name']
+    student_profile.last_name = form.cleaned_data['last_name']
+    student_profile.email = form.cleaned_data['email']
+    student_profile.save()
+    return user
+
 def register_view(request):
     #Регистрация нового пользователя
     if request.user.is_authenticated:
@@ -86,15 +150,9 @@ def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            # Создаем профиль студента
-            student_profile = Student.objects.get(user=user)
-            student_profile.first_name = form.cleaned_data['first_name']
-            student_profile.last_name = form.cleaned_data['last_name']
-            student_profile.email = form.cleaned_data['email']
-            student_profile.save()
+            user = save_registration(form)
             # Автоматически входим после регистрации
-            login(request, user)
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             messages.success(request, 'Регистрация прошла успешно! Добро пожаловать!')
             return redirect('profile')
     else:
@@ -104,12 +162,16 @@ def register_view(request):
         'title': 'Регистрация'
     })
 
+def login_failure_credentials(form):
+    # Пароль в сигнал не передается, как и в django.contrib.auth.authenticate
+    return {'username': form.data.get('username', '')}
+
 def login_view(request):
     #Вход в систему
     if request.user.is_authenticated:
         return redirect('profile')
     if request.method == 'POST':
-        form = CustomAuthenticationForm(data=request.POST)
+        form = CustomAuthenticationForm(request, data=request.POST)
         if form.is_valid():
             user = form.get_user()
             login(request, user)
@@ -118,14 +180,86 @@ def login_view(request):
             next_url = request.GET.get('next', 'profile')
             return redirect(next_url)
         else:
+            # Неизвестный логин отклоняет clean_username, и authenticate() не вызывается -
+            # сигнал о неудачном входе отправляем сами (для метрик)
+            if not (form.cleaned_data.get('username') and form.cleaned_data.get('password')):
+                user_login_failed.send(sender=__name__, credentials=login_failure_credentials(form),
+                                       request=request)
             messages.error(request, 'Неверный email или пароль')
     else:
-        form = CustomAuthenticationForm()
+        form = CustomAuthenticationForm(request)
     return render(request, 'fefu_lab/registration/login.html', {
         'form': form,
         'title': 'Вход в систему'
     })
 
+def hashing_unavailable():
+    return HttpResponse(
+        'Сервис временно перегружен, повторите попытку позже',
+        status=503,
+        headers={'Retry-After': '1'}
+    )
+
+async def async_register_view(request):
+    #Регистрация: хеш пароля считается в ограниченном пуле, а не в потоке event loop
+    user = await request.auser()
+    if user.is_authenticated:
+        return redirect('profile')
+    if request.method == 'POST':
+        form = CustomUserCreationForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            try:
+                form.password_hash = await amake_password(form.cleaned_data['password1'])
+            except HashingPoolSaturated:
+                return hashing_unavailable()
+            user = await sync_to_async(save_registration)(form)
+            await alogin(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+            messages.success(request, 'Регистрация прошла успешно! Добро пожаловать!')
+            return redirect('profile')
+    else:
+        form = CustomUserCreationForm()
+    return await sync_to_async(render)(request, 'fefu_lab/registration/register.html', {
+        'form': form,
+        'title': 'Регистрация'
+    })
+
+async def async_login_view(request):
+    #Вход в систему: проверка пароля в ограниченном пуле хеширования
+    user = await request.auser()
+    if user.is_authenticated:
+        return redirect('profile')
+    if request.method == 'POST':
+        form = AsyncAuthenticationForm(request, data=request.POST)
+        # Валидация полей и поиск пользователя (запоминается на запросе)
+        if await sync_to_async(form.is_valid)():
+            user = await sync_to_async(get_user_by_login)(form.cleaned_data['username'], request)
+            try:
+                password_ok = await acheck_password(form.cleaned_data['password'], user)
+            except HashingPoolSaturated:
+                return hashing_unavailable()
+            if password_ok:
+                try:
+                    form.confirm_login_allowed(user)
+                except ValidationError as error:
+                    form.add_error(None, error)
+                else:
+                    await alogin(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+                    messages.success(request, f'Добро пожаловать, {user.first_name}!')
+                    next_url = request.GET.get('next', 'profile')
+                    return redirect(next_url)
+            else:
+                form.add_error(None, form.get_invalid_login_error())
+        # authenticate() здесь не вызывается, поэтому сигнал о неудачном входе отправляем сами
+        await user_login_failed.asend(sender=__name__, credentials=login_failure_credentials(form),
+                                      request=request)
+        messages.error(request, 'Неверный email или пароль')
+    else:
+        form = AsyncAuthenticationForm(request)
+    return await sync_to_async(render)(request, 'fefu_lab/registration/login.html', {
+        'form': form,
+        'title': 'Вход в систему'
+    })
+
 def logout_view(request):
     #Выход из системы
     if request.user.is_authenticated:
@@ -155,12 +289,10 @@ def profile_view(request):
     # Получаем курсы преподавателя
     teacher_courses = None
     if student_profile.role == 'TEACHER':
-        # Ищем преподавателя по email
-        try:
-            instructor = Instructor.objects.get(email=student_profile.email)
-            teacher_courses = instructor.courses.all()  # Теперь работает!
-        except Instructor.DoesNotExist:
-            teacher_courses = Course.objects.none()  # Пустой QuerySet если нет преподавателя
+        # Курсы через связь Student.instructor - один запрос с JOIN
+        teacher_courses = Course.objects.filter(
+            instructor__student_profile=student_profile
+        ).select_related('instructor')
     return render(request, 'fefu_lab/registration/profile.html', {
         'student': student_profile,
         'enrollments': enrollments,
@@ -182,6 +314,7 @@ def profile_edit_view(request):
         form = ProfileUpdateForm(instance=student_profile, user=request.user)
     return render(request, 'fefu_lab/registration/profile_edit.html', {
         'form': form,
+        'student': student_profile,
         'title': 'Редактирование профиля'
     })
 
@@ -204,19 +337,26 @@ def password_change_view(request):
 
 #DASHBOARDS
 
+def get_role(user):
+    #Роль пользователя, запоминается на объекте user на время запроса
+    if not hasattr(user, '_fefu_role'):
+        try:
+            user._fefu_role = user.student_profile.role
+        except (Student.DoesNotExist, AttributeError):
+            user._fefu_role = None
+    return user._fefu_role
+
 def is_teacher(user):
     #Проверка что пользователь преподаватель
-    try:
-        return user.student_profile.role == 'TEACHER'
-    except Student.DoesNotExist:
-        return False
+    return get_role(user) == 'TEACHER'
 
 def is_admin(user):
     #Проверка что пользователь администратор
-    try:
-        return user.student_profile.role == 'ADMIN'
-    except Student.DoesNotExist:
-        return False
+    return get_role(user) == 'ADMIN'
+
+def is_student(user):
+    #Проверка что пользователь студент
+    return get_role(user) == 'STUDENT'
 
 
 @login_required
@@ -224,23 +364,23 @@ def is_admin(user):
 def teacher_dashboard_view(request):
     #Дашборд преподавателя
     student_profile = request.user.student_profile
-    #Ищем курсы через модель Instructor
-    try:
-        instructor = Instructor.objects.get(email=student_profile.email)
-        courses = instructor.courses.all()  # Курсы преподавателя
-    except Instructor.DoesNotExist:
-        courses = Course.objects.none()  # Пустой QuerySet
-    # Собираем статистику по курсам
-    course_stats = []
-    for course in courses:
-        enrollments_count = course.enrollments.filter(status='ACTIVE').count()
-        course_stats.append({
+    # Курсы преподавателя через связь Student.instructor, без поиска по email
+    courses = Course.objects.filter(instructor__student_profile=student_profile)
+    # Вся статистика по курсам - одним агрегирующим запросом
+    course_stats = [
+        {
             'course': course,
-            'enrollments_count': enrollments_count,
-            'available_spots': course.max_students - enrollments_count
-        })
+            'enrollments_count': course.active_count,
+            'completed_count': course.completed_count,
+            'cancelled_count': course.cancelled_count,
+            'available_spots': course.free_spots,
+        }
+        for course in courses.with_enrollment_stats()
+    ]
     return render(request, 'fefu_lab/dashboard/teacher_dashboard.html', {
         'course_stats': course_stats,
+        'total_enrollments': sum(stat['enrollments_count'] for stat in course_stats),
+        'courses_with_spots': sum(1 for stat in course_stats if stat['available_spots'] > 0),
         'title': 'Дашборд преподавателя'
     })
 
@@ -248,15 +388,10 @@ def teacher_dashboard_view(request):
 @user_passes_test(is_admin, login_url='/login/')
 def admin_dashboard_view(request):
     #Дашборд администратора
-    stats = {
-        'total_students': Student.objects.filter(role='STUDENT').count(),
-        'total_teachers': Student.objects.filter(role='TEACHER').count(),
-        'total_courses': Course.objects.count(),
-        'total_enrollments': Enrollment.objects.count(),
-        'active_enrollments': Enrollment.objects.filter(status='ACTIVE').count(),
-    }
-    recent_students = Student.objects.filter(role='STUDENT').order_by('-created_at')[:5]
-    recent_courses = Course.objects.order_by('-created_at')[:5]
+    # Метрики читаются из последнего снимка вместо пяти COUNT
+    stats = get_latest_snapshot()
+    recent_students = Student.objects.filter(role='STUDENT').select_related('user').order_by('-created_at')[:5]
+    recent_courses = Course.objects.select_related('instructor').order_by('-created_at')[:5]
     return render(request, 'fefu_lab/dashboard/admin_dashboard.html', {
         'stats': stats,
         'recent_students': recent_students,
@@ -279,6 +414,39 @@ def staff_only_view(request):
         'title': 'Только для персонала'
     })
 
+#ENROLLMENT
+
+ENROLLMENT_MESSAGES = {
+    course_enrollment.ENROLLED: (messages.SUCCESS, 'Вы записаны на курс'),
+    course_enrollment.WAITLISTED: (messages.INFO, 'Мест нет - вы в очереди ожидания'),
+    course_enrollment.ALREADY_ENROLLED: (messages.INFO, 'Вы уже записаны на этот курс'),
+    course_enrollment.ALREADY_WAITLISTED: (messages.INFO, 'Вы уже в очереди ожидания'),
+    course_enrollment.COMPLETED: (messages.WARNING, 'Вы уже прошли этот курс'),
+    course_enrollment.CANCELLED: (messages.SUCCESS, 'Запись на курс отменена'),
+    course_enrollment.LEFT_WAITLIST: (messages.SUCCESS, 'Вы вышли из очереди ожидания'),
+    course_enrollment.NOT_ENROLLED: (messages.WARNING, 'Вы не записаны на этот курс'),
+}
+
+@require_POST
+@login_required
+@user_passes_test(is_student, login_url='/login/')
+def course_enroll_view(request, course_slug):
+    #Запись на курс или постановка в очередь ожидания
+    course = get_object_or_404(Course, slug=course_slug, is_active=True)
+    result = course_enrollment.enroll(request.user.student_profile, course)
+    messages.add_message(request, *ENROLLMENT_MESSAGES[result])
+    return redirect('course_detail', course_slug=course.slug)
+
+@require_POST
+@login_required
+@user_passes_test(is_student, login_url='/login/')
+def course_unenroll_view(request, course_slug):
+    #Отмена записи или выход из очереди ожидания
+    course = get_object_or_404(Course, slug=course_slug)
+    result = course_enrollment.unenroll(request.user.student_profile, course)
+    messages.add_message(request, *ENROLLMENT_MESSAGES[result])
+    return redirect('course_detail', course_slug=course.slug)
+
 def custom_404(request, exception):
     return render(request, 'fefu_lab/404.html', status=404)
 
@@ -286,13 +454,13 @@ def feedback_view(request):
     if request.method == 'POST':
         form = FeedbackForm(request.POST)
         if form.is_valid():
-            # Сохраняем в базу данных
-            Feedback.objects.create(
+            # Сохраняем в базу данных пачкой в фоне (см. feedback_buffer.py)
+            submit_feedback(Feedback(
                 name=form.cleaned_data['name'],
                 email=form.cleaned_data['email'],
                 subject=form.cleaned_data['subject'],
                 message=form.cleaned_data['message']
-            )
+            ))
             return render(request, 'fefu_lab/success.html', {
                 'message': 'Спасибо за feedback.',
                 'title': 'Обратная связь'
@@ -0,0 +1,51 @@
+import os
+import time
+from django.conf import settings
+from django.db import connection
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import get_resolver
+from .db_connections import reuses_connections
+
+# Прогрев процесса перед первым запросом: URL-резолвер, шаблоны fefu_lab
+# и соединение с БД. Вызывается из post_fork в deploy/gunicorn/config.py.
+
+def template_names(prefix='fefu_lab'):
+    #Имена всех шаблонов с префиксом из каталогов DIRS
+    names = []
+    for directory in engines['django'].engine.dirs:
+        root = os.path.join(directory, prefix)
+        for current, _, files in os.walk(root):
+            for filename in files:
+                if filename.endswith('.html'):
+                    path = os.path.join(current, filename)
+                    names.append(os.path.relpath(path, directory).replace(os.sep, '/'))
+    return sorted(names)
+
+def warm_up(database=True, keep_connection=True):
+    #Возвращает время каждого шага в миллисекундах. keep_connection=False - соединение
+    #только проверяется и закрывается: запросы обслуживают другие потоки (gthread, ASGI),
+    #а соединения Django привязаны к потоку, и открытое здесь лишь занимало бы слот БД
+    timings = {}
+
+    started = time.perf_counter()
+    resolver = get_resolver()
+    # reverse_dict заполняет и прямые, и обратные таблицы резолвера
+    resolver.reverse_dict
+    timings['urls'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for name in template_names():
+        # Скомпилированный шаблон остается в cached.Loader (production)
+        get_template(name)
+    timings['templates'] = (time.perf_counter() - started) * 1000
+
+    if database and reuses_connections():
+        # Имеет смысл только для постоянных соединений и пула, иначе оно закроется в начале запроса
+        started = time.perf_counter()
+        connection.ensure_connection()
+        timings['database'] = (time.perf_counter() - started) * 1000
+        if not keep_connection:
+            # С пулом соединение возвращается в пул процесса и достанется потоку запроса
+            connection.close()
+    return timings
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_2025.settings')
+# Под ASGI вход и регистрация обслуживаются асинхронными view
+os.environ.setdefault('FEFU_ASYNC_AUTH', '1')
+# Стратегия соединений с БД по умолчанию - пул (см. DB_CONN_STRATEGY в settings)
+os.environ.setdefault('FEFU_ASGI', '1')
 
 application = get_asgi_application()
@@ -48,9 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы задержка в /metrics включала все остальные middleware
+    'fefu_lab.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Server-Timing и лог медленных запросов (FEFU_TIMING_SAMPLE_RATE, FEFU_SLOW_REQUEST_MS)
+    'fefu_lab.timing.RequestTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # 304 для ответов из кэша страниц, у которых уже есть ETag/Last-Modified
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -61,7 +67,10 @@ ROOT_URLCONF = 'web_2025.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с учетом времени рендеринга для Server-Timing
+        'BACKEND': 'fefu_lab.timing.TimedDjangoTemplates',
+        # Имя движка по умолчанию взялось бы из пути модуля ('timing')
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -76,6 +85,16 @@ TEMPLATES = [
     },
 ]
 
+# В production загрузчик шаблонов с кэшем скомпилированных шаблонов задаем явно
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'web_2025.wsgi.application'
 
 # Database
@@ -103,14 +122,94 @@ if USE_POSTGRES:
             "PORT": DB_PORT,
         }
     }
+
+    # DB_CONN_STRATEGY: none - новое соединение на каждый запрос;
+    # persistent (по умолчанию в wsgi) - соединение воркера живет DB_CONN_MAX_AGE секунд
+    # и проверяется перед повторным использованием;
+    # pool (по умолчанию в asgi) - пул psycopg 3 в каждом процессе, нужен psycopg[pool].
+    # Под ASGI синхронный ORM работает в потоках sync_to_async, и постоянное соединение
+    # остается открытым в каждом таком потоке, поэтому persistent там запрещен.
+    ASGI_MODE = os.environ.get("GUNICORN_MODE") == "asgi" or os.environ.get("FEFU_ASGI") == "1"
+    DB_CONN_STRATEGY = os.environ.get("DB_CONN_STRATEGY", "pool" if ASGI_MODE else "persistent").lower()
+    if DB_CONN_STRATEGY == "persistent":
+        if ASGI_MODE:
+            raise RuntimeError("DB_CONN_STRATEGY=persistent is not supported under ASGI, use pool or none")
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    elif DB_CONN_STRATEGY == "pool":
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            raise RuntimeError("DB_CONN_STRATEGY=pool requires the 'psycopg[pool]' package")
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                # Сколько ждать свободное соединение и сколько держать лишнее простаивающее
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", "300")),
+            }
+        }
+    elif DB_CONN_STRATEGY != "none":
+        raise RuntimeError(f"Unknown DB_CONN_STRATEGY: {DB_CONN_STRATEGY}")
 else:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # Транзакция сразу берет блокировку записи и ждет ее до timeout секунд,
+            # а не падает с "database is locked" при параллельной записи на курс
+            "OPTIONS": {
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+            # Тестовая БД в файле: в памяти (shared cache) параллельные потоки
+            # получают "table is locked" без ожидания
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 
+# Cache
+# DJANGO_CACHE_BACKEND: locmem (по умолчанию в development) - кэш внутри процесса;
+# file (по умолчанию в production) - общий для всех воркеров одного узла;
+# redis - общий для нескольких узлов (нужен пакет redis, DJANGO_CACHE_URL).
+
+CACHE_BACKEND = os.environ.get(
+    "DJANGO_CACHE_BACKEND", "file" if DJANGO_ENV == "production" else "locmem"
+).lower()
+CACHE_TIMEOUT = int(os.environ.get("DJANGO_CACHE_TIMEOUT", "300"))
+
+if CACHE_BACKEND == "locmem":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fefu_lab",
+    }
+elif CACHE_BACKEND == "file":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", str(BASE_DIR / "cache")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("DJANGO_CACHE_MAX_ENTRIES", "10000"))},
+    }
+elif CACHE_BACKEND == "redis":
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        raise RuntimeError("DJANGO_CACHE_BACKEND=redis requires the 'redis' package")
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("DJANGO_CACHE_URL", "redis://127.0.0.1:6379/1"),
+    }
+else:
+    raise RuntimeError(f"Unknown DJANGO_CACHE_BACKEND: {CACHE_BACKEND}")
+
+CACHES = {
+    "default": {
+        **_default_cache,
+        "TIMEOUT": CACHE_TIMEOUT,
+        "KEY_PREFIX": "fefu_lab",
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -164,6 +263,9 @@ LOGIN_REDIRECT_URL = '/profile/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Настройки сессий
+# cached_db: чтение сессии из кэша, запись - в кэш и в БД.
+# Просроченные сессии удаляет clearsessions (таймер systemd / entrypoint).
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 SESSION_COOKIE_AGE = 1209600  # 2 недели в секундах
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_COOKIE_SECURE = False  # True для HTTPS в продакшене
@@ -177,6 +279,67 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# Кэш статистики главной страницы: версии сбрасываются сигналами,
+# TTL нужен как страховка от пропущенных инвалидаций (bulk-операции и т.п.)
+FEFU_STATS_CACHE_TIMEOUT = int(os.environ.get("FEFU_STATS_CACHE_TIMEOUT", "300"))
+
+# Кэш целых страниц для анонимных посетителей (fefu_lab.page_cache)
+FEFU_PAGE_CACHE_TIMEOUT = int(os.environ.get("FEFU_PAGE_CACHE_TIMEOUT", "300"))
+
+# Инкрементальное обновление снимка админского дашборда сигналами;
+# при выключении снимок обновляется только командой refresh_dashboard_snapshot
+FEFU_DASHBOARD_INCREMENTAL = os.environ.get("FEFU_DASHBOARD_INCREMENTAL", "1") == "1"
+# Дельты копятся в процессе и пишутся в снимок не чаще раза в столько секунд
+# (0 - после каждой записи); см. fefu_lab.dashboard
+FEFU_DASHBOARD_FLUSH_INTERVAL = float(os.environ.get("FEFU_DASHBOARD_FLUSH_INTERVAL", "5"))
+
+# Асинхронные view входа и регистрации (включаются по умолчанию в asgi.py).
+# Хеширование паролей идет в пуле на FEFU_HASHING_WORKERS потоков с очередью
+# не длиннее FEFU_HASHING_QUEUE_DEPTH; при переполнении отвечаем 503.
+FEFU_ASYNC_AUTH = os.environ.get("FEFU_ASYNC_AUTH", "0") == "1"
+FEFU_HASHING_WORKERS = int(os.environ.get("FEFU_HASHING_WORKERS", os.cpu_count() or 1))
+FEFU_HASHING_QUEUE_DEPTH = int(os.environ.get("FEFU_HASHING_QUEUE_DEPTH", FEFU_HASHING_WORKERS * 4))
+
 # Медиа файлы для аватаров
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Загрузки пишутся во временный файл на диске, а не в память процесса
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Ограничения для аватаров (см. fefu_lab.avatars); nginx режет тело запроса раньше
+FEFU_AVATAR_MAX_UPLOAD_SIZE = int(os.environ.get("FEFU_AVATAR_MAX_UPLOAD_SIZE", 5 * 1024 * 1024))
+FEFU_AVATAR_MAX_PIXELS = int(os.environ.get("FEFU_AVATAR_MAX_PIXELS", 40_000_000))
+
+# Замер запросов (fefu_lab/timing.py): доля запросов с подробным замером SQL и шаблонов,
+# порог медленного запроса в мс (0 - не логировать) и сколько повторов одного SQL
+# за запрос считается N+1
+FEFU_TIMING_SAMPLE_RATE = float(os.environ.get("FEFU_TIMING_SAMPLE_RATE", "1" if DEBUG else "0.01"))
+FEFU_SLOW_REQUEST_MS = float(os.environ.get("FEFU_SLOW_REQUEST_MS", "500"))
+FEFU_DUPLICATE_QUERY_THRESHOLD = int(os.environ.get("FEFU_DUPLICATE_QUERY_THRESHOLD", "3"))
+
+# Отложенная запись отзывов (fefu_lab/feedback_buffer.py): размер очереди процесса
+# (0 - писать сразу в запросе), размер пачки bulk_create и максимальная задержка записи в мс
+FEFU_FEEDBACK_BUFFER_SIZE = int(os.environ.get("FEFU_FEEDBACK_BUFFER_SIZE", "1000"))
+FEFU_FEEDBACK_BATCH_SIZE = int(os.environ.get("FEFU_FEEDBACK_BATCH_SIZE", "100"))
+FEFU_FEEDBACK_FLUSH_MS = int(os.environ.get("FEFU_FEEDBACK_FLUSH_MS", "200"))
+
+# Как часто (в секундах) фоновый поток воркера переносит наблюдения в метрики /metrics
+FEFU_METRICS_FLUSH_INTERVAL = float(os.environ.get("FEFU_METRICS_FLUSH_INTERVAL", "1"))
+# Сколько наблюдений может ждать фонового потока; дальше их переносит сам запрос
+FEFU_METRICS_MAX_PENDING = int(os.environ.get("FEFU_METRICS_MAX_PENDING", "10000"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "fefu_lab": {
+            "handlers": ["console"],
+            "level": os.environ.get("FEFU_LOG_LEVEL", "INFO"),
+        },
+    },
+}